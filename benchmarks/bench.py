@@ -0,0 +1,323 @@
+"""Benchmarks for the build pipeline on a synthetic site.
+
+Run from the repository root, for example:
+
+    python -m benchmarks.bench --pages 500 --output results.json
+
+Results are written as JSON so runs can be compared across commits.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import platform
+import random
+import statistics
+import subprocess  # noqa:S404
+import sys
+import tempfile
+import time
+import typing
+
+import enerator.add
+import enerator.generate
+import enerator.markdown
+import enerator.preview
+import enerator.sitemap
+
+PAGE = '''"""Synthetic benchmark page."""
+
+import pathlib
+
+import enerator
+
+CONFIG = {{"title": "Page {number}", "path": "{sitepath}", "watch": ["index.md"]}}
+
+
+def page(rel: dict) -> str:
+    """Output page content.
+
+    Args:
+        rel: related info (variables, etc.) as a dict
+
+    Returns:
+        string with page content
+    """
+    md = (pathlib.Path(rel["modpath"]) / "index.md").read_text()
+    body = enerator.md_highlight_and_parse(md)
+    return f"<html><body>{{body}}</body></html>"
+'''
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua"
+).split()
+
+CODE = {
+    "python": "def func_{n}(value):\n    return [item * {n} for item in value]\n",
+    "javascript": (
+        "function func{n}(value) {{\n  return value.map((x) => x * {n});\n}}\n"
+    ),
+    "bash": 'for item in $(seq {n}); do\n  echo "$item"\ndone\n',
+    "rust": (
+        "fn func_{n}(value: &[i32]) -> Vec<i32> {{\n"
+        "    value.iter().map(|x| x * {n}).collect()\n}}\n"
+    ),
+}
+
+
+class SiteParams(typing.NamedTuple):
+    """Shape of a synthetic site."""
+
+    pages: int = 50
+    paragraphs: int = 20
+    code_density: float = 0.3
+    languages: typing.Tuple[str, ...] = tuple(CODE)
+    seed: int = 0
+
+
+def synthetic_markdown(rng: random.Random, params: SiteParams) -> str:
+    """Generate a Markdown document.
+
+    Args:
+        rng: random number generator
+        params: shape of the site
+
+    Returns:
+        Markdown with headings, paragraphs and fenced code blocks
+    """
+    blocks = [f"# {' '.join(rng.choices(WORDS, k=4)).title()}"]
+    for number in range(params.paragraphs):
+        if rng.random() < params.code_density:
+            lang = rng.choice(params.languages)
+            blocks.append(f"```{lang}\n{CODE[lang].format(n=number)}```")
+        else:
+            blocks.append(" ".join(rng.choices(WORDS, k=rng.randint(30, 120))))
+    return "\n\n".join(blocks) + "\n"
+
+
+def synthesize(root: pathlib.Path, params: SiteParams) -> typing.List[str]:
+    """Create a synthetic site with the add scaffolding.
+
+    Args:
+        root: directory in which to create the site; must be the cwd
+        params: shape of the site
+
+    Returns:
+        module names of the generated pages
+    """
+    rng = random.Random(params.seed)
+    modules = []
+    for number in range(params.pages):
+        module = f"synth.section{number % 10}.page{number}"
+        sitepath = f"/section{number % 10}/page{number}/"
+        dirpath = enerator.add.add(module, pathlib.PurePosixPath(sitepath))
+        (dirpath / "__init__.py").write_text(
+            PAGE.format(number=number, sitepath=sitepath)
+        )
+        (dirpath / "index.md").write_text(synthetic_markdown(rng, params))
+        modules.append(module)
+    return modules
+
+
+def reset_caches(modules: typing.Iterable[str]) -> None:
+    """Forget loaded pages and cached results between measurements.
+
+    Args:
+        modules: module names of the generated pages
+    """
+    for module in modules:
+        sys.modules.pop(module, None)
+    enerator.sitemap.sitemap_read.cache_clear()
+    enerator.generate.all_urls.cache_clear()
+    enerator.generate.routes.cache_clear()
+    enerator.markdown.highlight.cache_clear()
+    enerator.preview.page_cache.clear()
+
+
+def timed(func: typing.Callable, *args: typing.Any) -> float:
+    """Time a single call.
+
+    Args:
+        func: function to call
+        args: positional arguments
+
+    Returns:
+        elapsed seconds
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+async def preview_request(path: str) -> float:
+    """Time a request to the preview app.
+
+    Args:
+        path: URL path
+
+    Returns:
+        elapsed seconds
+    """
+
+    async def send(message: dict) -> None:  # noqa:WPS430
+        """Discard response messages."""
+
+    scope = {"type": "http", "path": path, "headers": [], "scheme": "http"}
+    start = time.perf_counter()
+    await enerator.preview.app(scope, None, send)  # type: ignore
+    return time.perf_counter() - start
+
+
+def bench_markdown(root: pathlib.Path, repeat: int) -> dict:
+    """Measure Markdown highlighting and parsing throughput.
+
+    Args:
+        root: directory of the synthetic site
+        repeat: number of passes
+
+    Returns:
+        throughput figures
+    """
+    docs = [path.read_text() for path in sorted(root.glob("synth/**/index.md"))]
+    size = sum(len(doc.encode()) for doc in docs)
+    times = []
+    for _ in range(repeat):
+        enerator.markdown.highlight.cache_clear()
+        start = time.perf_counter()
+        for doc in docs:
+            enerator.markdown.md_highlight_and_parse(doc)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {"bytes": size, "seconds": best, "mb_per_second": size / best / 1e6}
+
+
+def bench_preview(modules: typing.List[str], repeat: int) -> dict:
+    """Measure preview request latency for cold and cached pages.
+
+    Args:
+        modules: module names of the generated pages
+        repeat: number of warm requests per page
+
+    Returns:
+        latency figures in seconds
+    """
+    sample = modules[: min(len(modules), 10)]
+    paths = [enerator.generate.url_for(module) for module in sample]
+
+    async def measure() -> typing.Tuple[list, list]:  # noqa:WPS430
+        """Request each page cold, then repeatedly warm."""
+        cold = [await preview_request(path) for path in paths]
+        warm = [await preview_request(path) for path in paths for _ in range(repeat)]
+        return (cold, warm)
+
+    cold, warm = asyncio.run(measure())
+    return {
+        "cold_median": statistics.median(cold),
+        "warm_median": statistics.median(warm),
+    }
+
+
+def run(params: SiteParams, jobs: int = 1, repeat: int = 3) -> dict:
+    """Build a synthetic site and time the pipeline.
+
+    Args:
+        params: shape of the site
+        jobs: worker processes for full builds
+        repeat: number of passes for repeated measurements
+
+    Returns:
+        benchmark results
+    """
+    old_cwd = os.getcwd()
+    modules: typing.List[str] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        root = pathlib.Path(tmp)
+        os.chdir(root)
+        try:
+            modules = synthesize(root, params)
+            reset_caches(modules)
+            out = root / "out"
+            full = timed(enerator.generate.generate_site, out, jobs, True)
+            reset_caches(modules)
+            noop = timed(enerator.generate.generate_site, out, jobs)
+            single = []
+            for _ in range(repeat):
+                reset_caches(modules)
+                single.append(timed(enerator.generate.generate, modules[0], out, True))
+            results = {
+                "full_build_seconds": full,
+                "full_build_pages_per_second": len(modules) / full,
+                "noop_build_seconds": noop,
+                "single_page_seconds": min(single),
+                "markdown": bench_markdown(root, repeat),
+                "preview": bench_preview(modules, repeat),
+            }
+        finally:
+            reset_caches(modules)
+            os.chdir(old_cwd)
+    return results
+
+
+def commit() -> typing.Optional[str]:
+    """Identify the commit being benchmarked.
+
+    Returns:
+        git commit hash, if available
+    """
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.check_output(  # noqa:S603,S607
+            ["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    return None
+
+
+def main(argv: typing.Optional[list] = None) -> dict:
+    """Run benchmarks from the command line.
+
+    Args:
+        argv: command line arguments
+
+    Returns:
+        benchmark report
+    """
+    defaults = SiteParams()
+    parser = argparse.ArgumentParser(description=__doc__.partition("\n")[0])
+    parser.add_argument("--pages", type=int, default=defaults.pages)
+    parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs)
+    parser.add_argument("--code-density", type=float, default=defaults.code_density)
+    parser.add_argument(
+        "--languages", default=",".join(defaults.languages), help="comma separated"
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=pathlib.Path, help="JSON results file")
+    args = parser.parse_args(argv)
+    params = SiteParams(
+        args.pages,
+        args.paragraphs,
+        args.code_density,
+        tuple(args.languages.split(",")),
+        args.seed,
+    )
+    report = {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "params": params._asdict(),
+        "jobs": args.jobs,
+        "results": run(params, args.jobs, args.repeat),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(f"{text}\n")
+    else:
+        sys.stdout.write(f"{text}\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -8,5 +8,6 @@ setup(
     package_dir={"": "src"},
     entry_points={"console_scripts": ["enerator=enerator.commands:main"]},
     install_requires=["cmarkgfm", "pygments", "uvicorn"],
+    python_requires=">=3.7",
     zip_safe=False,
 )
@@ -1,4 +1,48 @@
-"""Simple Static Site Generator using Python."""
+"""Simple Static Site Generator using Python.
 
-from .generate import generate_page, load_module, url_for
-from .markdown import md_highlight_and_parse, md_parse
+The functions below are imported from their modules on first use, so that
+importing enerator (as the command line does) stays cheap.
+"""
+
+import importlib
+import typing
+
+LAZY = {
+    "asset_url": "enerator.assets",
+    "generate_page": "enerator.generate",
+    "load_module": "enerator.generate",
+    "url_for": "enerator.generate",
+    "md_highlight_and_parse": "enerator.markdown",
+    "md_highlight_and_parse_iter": "enerator.markdown",
+    "md_parse": "enerator.markdown",
+}
+
+__all__ = list(LAZY)
+
+
+def __getattr__(name: str) -> typing.Any:
+    """Import a public function from its module on first use.
+
+    Args:
+        name: attribute name
+
+    Returns:
+        the function
+
+    Raises:
+        AttributeError: if name is not a public function
+    """
+    if name not in LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    attr = getattr(importlib.import_module(LAZY[name]), name)
+    globals()[name] = attr
+    return attr
+
+
+def __dir__() -> typing.List[str]:
+    """List module attributes, including those not yet imported.
+
+    Returns:
+        attribute names
+    """
+    return sorted({*globals(), *LAZY})
@@ -1,28 +1,34 @@
 """Methods for creating/scaffolding pages."""
 
+import csv
 import pathlib
 import typing
 
-from enerator.sitemap import sitemap_add
+from enerator.sitemap import sitemap_add, sitemap_add_many
+
+PageSpec = typing.Tuple[str, typing.Optional[pathlib.PurePosixPath]]
 
 INIT = '''#!/usr/bin/env python3
 """Page generator."""
 
+import collections
+import typing
+
 import enerator
 
 CONFIG = {{"title": "The tech blog of Jonathan Bowman", "path": "{sitepath}"}}
 
 
-def page(rel: dict) -> str:
+def page(rel: typing.Mapping) -> str:
     """Output page content.
 
     Args:
-        rel: related info (variables, etc.) as a dict
+        rel: related info (variables, page urls, etc.) as a mapping
 
     Returns:
         string with page content
     """
-    config = {{**CONFIG, **rel}}
+    config = collections.ChainMap(rel, CONFIG)
     md = "*Hello*, {{title}}!"
     return enerator.md_highlight_and_parse(md)
 
@@ -46,20 +52,86 @@ def add(module: str, sitepath: typing.Optional[pathlib.PurePosixPath]) -> pathli
         the path to the directory of the module
     """
     dirpath = module_to_path(module)
-    mod_init = create_dirs(dirpath)
-    if not mod_init.exists() or mod_init.stat().st_size == 0:
-        mod_init.touch(0o775)  # noqa:WPS432
-        mod_init.write_text(INIT.format(sitepath=sitepath))
+    write_template(create_dirs(dirpath), sitepath)
     if sitepath is not None:
         sitemap_add(module)
     return dirpath
 
 
-def create_dirs(dirpath: pathlib.Path) -> pathlib.Path:
+def add_many(pages: typing.Iterable[PageSpec]) -> typing.List[pathlib.Path]:
+    """Add many pages at once.
+
+    Each directory is created, and its __init__.py touched, only once no
+    matter how many pages share it, and the sitemap is updated in a single
+    write.
+
+    Args:
+        pages: pairs of module name and desired URL path (None for templates)
+
+    Returns:
+        the paths to the directories of the modules
+    """
+    seen: typing.Set[pathlib.Path] = set()
+    dirpaths = []
+    listed = []
+    for module, sitepath in pages:
+        dirpath = module_to_path(module)
+        write_template(create_dirs(dirpath, seen), sitepath)
+        if sitepath is not None:
+            listed.append(module)
+        dirpaths.append(dirpath)
+    sitemap_add_many(listed)
+    return dirpaths
+
+
+def read_pages_csv(path: pathlib.Path) -> typing.List[PageSpec]:
+    """Read page definitions from a CSV file.
+
+    Each row holds a module name and an optional URL path; rows without a
+    URL path define templates. A leading "module,sitepath" header row and
+    blank rows are skipped.
+
+    Args:
+        path: CSV file path
+
+    Returns:
+        pairs of module name and URL path
+    """
+    pages = []
+    with path.open(newline="") as fp:
+        for row in csv.reader(fp):
+            cells = [cell.strip() for cell in row]
+            if not cells or not cells[0] or cells[:1] == ["module"]:
+                continue
+            sitepath = None
+            if len(cells) > 1 and cells[1]:
+                sitepath = pathlib.PurePosixPath(cells[1])
+            pages.append((cells[0], sitepath))
+    return pages
+
+
+def write_template(
+    mod_init: pathlib.Path, sitepath: typing.Optional[pathlib.PurePosixPath]
+) -> None:
+    """Write the page template unless the module already has content.
+
+    Args:
+        mod_init: path to the module's __init__.py
+        sitepath: desired URL path
+    """
+    if not mod_init.exists() or mod_init.stat().st_size == 0:
+        mod_init.touch(0o775)  # noqa:WPS432
+        mod_init.write_text(INIT.format(sitepath=sitepath))
+
+
+def create_dirs(
+    dirpath: pathlib.Path, seen: typing.Optional[typing.Set[pathlib.Path]] = None
+) -> pathlib.Path:
     """Create directories and populate with appropriate __init__.py.
 
     Args:
         dirpath: a pathlib Path.
+        seen: directories already created in this batch; updated in place
 
     Returns:
         path to __init__.py
@@ -67,11 +139,15 @@ def create_dirs(dirpath: pathlib.Path) -> pathlib.Path:
     """
     cwd = pathlib.Path.cwd()
     mod_init = dirpath / "__init__.py"
-    dirpath.mkdir(parents=True, exist_ok=True)
+    if seen is None:
+        seen = set()
+    if dirpath not in seen:
+        dirpath.mkdir(parents=True, exist_ok=True)
     for directory in mod_init.parents:
-        if directory == cwd:
+        if directory == cwd or directory in seen:
             break
         (directory / "__init__.py").touch()
+        seen.add(directory)
     return mod_init
 
 
@@ -0,0 +1,299 @@
+"""Copying static assets into the output directory.
+
+Files below the assets directory are placed at the same path below the
+output directory. A file is only copied when its size or modification
+time differs from the copy already there, and is cloned (reflinked) where
+the filesystem supports it, or hard linked when asked, before falling
+back to a plain copy. Files that no longer exist in the source are
+removed from the output.
+
+With fingerprinting, each file is published under a name carrying a hash
+of its content, such as assets/site.3f2a9c1d0b7e.css, so it can be served
+with a far-future cache lifetime. Pages look up the published URL with
+asset_url(), which returns the plain URL when assets are not fingerprinted
+(as in preview).
+"""
+
+import contextlib
+import os
+import pathlib
+import shutil
+import typing
+
+import enerator.deps
+from enerator.cache import CACHE_DIR, file_digest, read_json, write_json
+from enerator.output import COMPRESSORS, OutputWriter, write_compressed
+
+try:
+    import fcntl  # noqa:WPS433
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+ASSET_DIR = pathlib.Path("assets")
+ASSET_INDEX = CACHE_DIR / "assets.json"
+FINGERPRINT_SIZE = 12
+FICLONE = 0x40049409
+COMPRESSIBLE = frozenset((".css", ".js", ".json", ".svg", ".txt", ".xml"))
+
+fingerprints = False
+hard_links = False
+urls: typing.Dict[str, str] = {}
+
+
+class Asset(typing.NamedTuple):
+    """A source file in the assets directory."""
+
+    source: pathlib.Path
+    relpath: str
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def configure(fingerprint: bool = False, link: bool = False) -> None:
+    """Choose how builds publish assets.
+
+    Args:
+        fingerprint: publish each file under a content-hashed name
+        link: hard link rather than copy where possible
+    """
+    global fingerprints, hard_links  # noqa:WPS420
+    fingerprints = fingerprint  # noqa:WPS442
+    hard_links = link  # noqa:WPS442
+
+
+def set_urls(published: typing.Mapping[str, str]) -> None:
+    """Set the URLs that asset_url() returns.
+
+    Args:
+        published: published URL of each asset, keyed by its plain URL
+    """
+    urls.clear()
+    urls.update(published)
+
+
+def asset_url(path: str) -> str:
+    """Look up the published URL of an asset.
+
+    A fingerprinted asset is recorded as an input of the page being
+    rendered, so that only the pages using it are rebuilt when it changes.
+
+    Args:
+        path: path of the asset within the assets directory, such as
+            "css/site.css"
+
+    Returns:
+        absolute URL of the asset, fingerprinted if enabled for this build
+    """
+    plain = f"/{ASSET_DIR.as_posix()}/{path.lstrip('/')}"
+    url = urls.get(plain, plain)
+    if url != plain:
+        enerator.deps.note(str(ASSET_DIR / path.lstrip("/")))
+    return url
+
+
+def fingerprinted(relpath: str, digest: str) -> str:
+    """Insert a content hash into a file name.
+
+    Args:
+        relpath: path of the file
+        digest: hex digest of its content
+
+    Returns:
+        path with the hash before the suffix
+    """
+    path = pathlib.PurePosixPath(relpath)
+    stem = path.name[: -len(path.suffix)] if path.suffix else path.name
+    return str(path.with_name(f"{stem}.{digest[:FINGERPRINT_SIZE]}{path.suffix}"))
+
+
+def scan_assets(root: pathlib.Path = ASSET_DIR) -> typing.List[Asset]:
+    """List the files in the assets directory with their content hashes.
+
+    Hashes are kept in .enerator/assets.json and only recomputed when a
+    file's size or modification time changes.
+
+    Args:
+        root: assets directory
+
+    Returns:
+        assets, sorted by path
+    """
+    if not root.is_dir():
+        return []
+    cached = read_json(ASSET_INDEX)
+    entries = {}
+    assets = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            source = pathlib.Path(dirpath) / filename
+            relpath = source.relative_to(root).as_posix()
+            stat = source.stat()
+            entry = cached.get(relpath)
+            if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+                content_digest = entry[2]
+            else:
+                content_digest = file_digest(source) or ""
+            entries[relpath] = [stat.st_size, stat.st_mtime_ns, content_digest]
+            assets.append(
+                Asset(source, relpath, stat.st_size, stat.st_mtime_ns, content_digest)
+            )
+    if entries != cached:
+        write_json(ASSET_INDEX, entries)
+    return sorted(assets, key=lambda asset: asset.relpath)
+
+
+def clone_file(src: pathlib.Path, dst: pathlib.Path) -> bool:
+    """Clone a file so that it shares storage with the original.
+
+    Args:
+        src: existing file
+        dst: new file
+
+    Returns:
+        False if the filesystem cannot clone files
+    """
+    if fcntl is None:  # pragma: no cover
+        return False
+    try:
+        with src.open("rb") as src_fp, dst.open("wb") as dst_fp:
+            fcntl.ioctl(dst_fp.fileno(), FICLONE, src_fp.fileno())
+    except OSError:
+        with contextlib.suppress(FileNotFoundError):
+            dst.unlink()
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def place_file(src: pathlib.Path, dst: pathlib.Path, link: bool = False) -> None:
+    """Put a copy of a file in place, atomically.
+
+    Args:
+        src: existing file
+        dst: destination
+        link: hard link rather than copy where possible; the output then
+            changes whenever the source is edited in place
+    """
+    tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        try:
+            if not link:
+                raise OSError
+            os.link(src, tmp_path)
+        except OSError:
+            if not clone_file(src, tmp_path):
+                shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            tmp_path.unlink()
+
+
+def is_current(asset: Asset, dst: pathlib.Path) -> bool:
+    """Check whether a copy of an asset is up to date.
+
+    Like rsync, this compares size and modification time only.
+
+    Args:
+        asset: source file
+        dst: existing copy
+
+    Returns:
+        True if the copy need not be replaced
+    """
+    try:
+        stat = dst.stat()
+    except FileNotFoundError:
+        return False
+    return stat.st_size == asset.size and stat.st_mtime_ns == asset.mtime_ns
+
+
+def copy_asset(
+    asset: Asset, dst: pathlib.Path, link: bool, encodings: typing.Tuple[str, ...]
+) -> None:
+    """Copy one asset unless its copy is up to date.
+
+    Args:
+        asset: source file
+        dst: destination
+        link: hard link rather than copy where possible
+        encodings: content encodings to precompress text assets in
+    """
+    changed = not is_current(asset, dst)
+    if changed:
+        place_file(asset.source, dst, link)
+    if dst.suffix in COMPRESSIBLE:
+        write_compressed(dst, encodings, changed)
+
+
+def publish_assets(
+    writer: OutputWriter,
+    fingerprint: typing.Optional[bool] = None,
+    link: typing.Optional[bool] = None,
+    root: pathlib.Path = ASSET_DIR,
+) -> typing.Dict[str, str]:
+    """Copy changed assets into the output and remove stale ones.
+
+    Copies are made on the writer's I/O threads, and so land in its
+    staging directory when the build is staged.
+
+    Args:
+        writer: writer for the output directory
+        fingerprint: publish each file under a content-hashed name; defaults
+            to the configured setting
+        link: hard link rather than copy where possible; defaults to the
+            configured setting
+        root: assets directory
+
+    Returns:
+        published URL of each asset, keyed by its plain URL
+    """
+    if fingerprint is None:
+        fingerprint = fingerprints
+    if link is None:
+        link = hard_links
+    published = {}
+    copies = {}
+    target = writer.target / root.name
+    for asset in scan_assets(root):
+        relpath = asset.relpath
+        if fingerprint:
+            relpath = fingerprinted(relpath, asset.digest)
+        copies[target / relpath] = asset
+        published[f"/{root.name}/{asset.relpath}"] = f"/{root.name}/{relpath}"
+    prune(target, set(copies), writer.encodings)
+    for dst, asset in copies.items():
+        if dst.parent not in writer.dirs:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            writer.dirs.add(dst.parent)
+        writer.submit(copy_asset, asset, dst, link, writer.encodings)
+    return published
+
+
+def prune(
+    target: pathlib.Path,
+    wanted: typing.Set[pathlib.Path],
+    encodings: typing.Iterable[str] = (),
+) -> None:
+    """Remove files in the output assets directory that are not wanted.
+
+    Args:
+        target: assets directory in the output
+        wanted: files to keep
+        encodings: content encodings whose precompressed copies are kept
+    """
+    suffixes = tuple(COMPRESSORS[encoding].suffix for encoding in encodings)
+    if not target.is_dir():
+        return
+    for dirpath, _, filenames in os.walk(target):
+        for filename in filenames:
+            path = pathlib.Path(dirpath) / filename
+            if path in wanted:
+                continue
+            original = path
+            for suffix in suffixes:
+                if filename.endswith(suffix):
+                    original = path.with_name(filename[: -len(suffix)])
+            if original not in wanted:
+                path.unlink()
@@ -0,0 +1,67 @@
+"""Build cache directory and content hashing helpers."""
+
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import typing
+
+CACHE_DIR = pathlib.Path(".enerator")
+
+
+def digest(data: bytes) -> str:
+    """Hash a blob of bytes.
+
+    Args:
+        data: bytes to hash
+
+    Returns:
+        hex digest of the content
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: pathlib.Path) -> typing.Optional[str]:
+    """Hash the contents of a file.
+
+    Args:
+        path: file to hash
+
+    Returns:
+        hex digest of the file contents, or None if the file does not exist
+    """
+    try:
+        return digest(path.read_bytes())
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+
+
+def read_json(path: pathlib.Path) -> dict:
+    """Load a JSON cache file.
+
+    Args:
+        path: cache file path
+
+    Returns:
+        the decoded dict, or an empty dict if missing or unreadable
+    """
+    with contextlib.suppress(FileNotFoundError, ValueError):
+        with path.open() as fp:
+            data = json.load(fp)
+        if isinstance(data, dict):
+            return data
+    return {}
+
+
+def write_json(path: pathlib.Path, data: dict) -> None:
+    """Atomically write a JSON cache file.
+
+    Args:
+        path: cache file path
+        data: JSON-serializable dict
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data, sort_keys=True))
+    os.replace(tmp_path, path)
@@ -1,62 +1,262 @@
-"""Commandline parsers and functions."""
+"""Commandline parsers and functions.
 
+Each subcommand imports the modules it needs when it runs, so that a
+command such as enerator add does not pay for loading Pygments, cmarkgfm
+or the preview server.
+"""
+
+import contextlib
 import pathlib
 import sys
+import time
 from argparse import Namespace
 
-import enerator.add
-import enerator.generate
-import enerator.preview
 from enerator.subcommand import Cmdargs, parse_args, subcommand
-from enerator.generate import url_for
+
+RENDER_POOLS = ("thread", "process")
 
 
 @subcommand(
     (
-        Cmdargs(("module",), "module name, such as page.my_title"),
+        Cmdargs(("module",), "module name, such as page.my_title", nargs="?"),
         Cmdargs(
             ("-s", "--sitepath"),
             "sitepath, such as /category/my_page/",
             pathlib.PurePosixPath,
         ),
+        Cmdargs(
+            ("--from-file",),
+            "CSV file of module,sitepath rows to add in one batch",
+            pathlib.Path,
+        ),
     )
 )
 def add(args: Namespace) -> None:
     """Add a page.
 
     This creates the designated directories and files and updates the
-    sitemap.
+    sitemap. With --from-file, every page listed in the CSV file is added
+    and the sitemap is written once.
 
     Args:
         args: a Namespace object returned from argparse parser.
     """
-    dirpath = enerator.add.add(args.module, args.sitepath)
-    sys.stdout.write(f"{dirpath}\n")
+    import enerator.add  # noqa:WPS433
+
+    from_file = getattr(args, "from_file", None)
+    if from_file:
+        pages = enerator.add.read_pages_csv(from_file)
+        if args.module:
+            pages.append((args.module, args.sitepath))
+        dirpaths = enerator.add.add_many(pages)
+    elif args.module:
+        dirpaths = [enerator.add.add(args.module, args.sitepath)]
+    else:
+        sys.exit("enerator add: a module or --from-file is required")
+    sys.stdout.write("".join(f"{dirpath}\n" for dirpath in dirpaths))
 
 
 @subcommand(
     (
         Cmdargs(("-m", "--module"), "module name, such as page.my_title"),
         Cmdargs(("-o", "--output"), "directory for static site output", pathlib.Path),
+        Cmdargs(
+            ("-j", "--jobs"),
+            "number of worker processes when generating the whole site",
+            int,
+            default=1,
+        ),
+        Cmdargs(
+            ("-f", "--force"),
+            "regenerate pages even if unchanged since the last build",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--stage",),
+            "build the site in a new directory and swap it in when complete",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--precompress",),
+            "also write .gz (and .br, if brotli is installed) copies of output",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--fingerprint",),
+            "publish assets under content-hashed file names",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--link-assets",),
+            "hard link assets into the output instead of copying them",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--minify",),
+            "minify generated HTML and report the bytes saved",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--short-classes",),
+            "with --minify, shorten highlight classes and write highlight.css",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--highlight-cache",),
+            "keep highlighted code blocks on disk for reuse across builds",
+            None,
+            "store_true",
+        ),
+        Cmdargs(
+            ("--daemon",),
+            "build in a running enerator daemon, if there is one",
+            None,
+            "store_true",
+        ),
+        Cmdargs(("--profile",), "report per-page stage timings", None, "store_true"),
+        Cmdargs(
+            ("--profile-top",), "number of slowest pages to report", int, default=10
+        ),
+        Cmdargs(
+            ("--profile-out",),
+            "also write cProfile stats for this process to a file",
+            pathlib.Path,
+        ),
     )
 )
 def gen(args: Namespace) -> None:
     """Generate page(s).
 
+    Without a module, every page in the sitemap is generated. Pages that are
+    unchanged since the last build are skipped unless --force is given.
+    With --stage, a failed build leaves the previous output untouched.
+    Changed files in the assets directory are copied into the output; with
+    --fingerprint, under names carrying a hash of their content.
+    With --minify, the bytes saved on the pages minified by this build are
+    reported at the end.
+    With --highlight-cache, blocks unused for 30 days are removed from the
+    store after the build.
+    With --profile, per-page stage timings and highlight cache use are
+    reported at the end.
+    With --daemon, the build runs in enerator daemon when one is listening.
+
     Args:
         args: a Namespace object returned from argparse parser.
     """
-    output_path = enerator.generate.generate(args.module, args.output)
-    sys.stdout.write(f"{output_path}\n")
+    if args.daemon:
+        import enerator.daemon  # noqa:WPS433
+
+        try:
+            status = enerator.daemon.request(args)
+        except enerator.daemon.DaemonUnavailable:
+            sys.stderr.write("enerator gen: no daemon is running; building here\n")
+        else:
+            if status:
+                sys.exit(status)
+            return
+    import enerator.assets  # noqa:WPS433
+    import enerator.generate  # noqa:WPS433
+    import enerator.manifest  # noqa:WPS433
+    import enerator.markdown  # noqa:WPS433
+    import enerator.minify  # noqa:WPS433
+    import enerator.output  # noqa:WPS433
+    import enerator.sitemap  # noqa:WPS433
+    import enerator.timing  # noqa:WPS433
+
+    enerator.markdown.set_highlight_store(
+        enerator.markdown.HIGHLIGHT_STORE_DIR if args.highlight_cache else None
+    )
+    enerator.assets.configure(args.fingerprint, args.link_assets)
+    enerator.minify.configure(args.minify, args.short_classes)
+    enerator.timing.enable(args.profile)
+    profiler = None
+    if args.profile_out:
+        import cProfile  # noqa:WPS433
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    encodings = tuple(enerator.output.COMPRESSORS) if args.precompress else ()
+    if args.module:
+        output_path = enerator.generate.generate(
+            args.module, args.output, args.force, encodings
+        )
+        sys.stdout.write(f"{output_path}\n")
+        modules = [args.module]
+    else:
+        start = time.perf_counter()
+        output_paths = enerator.generate.generate_site(
+            args.output, args.jobs, args.force, args.stage, encodings
+        )
+        elapsed = time.perf_counter() - start
+        for output_path in output_paths:
+            sys.stdout.write(f"{output_path}\n")
+        count = len(output_paths)
+        rate = count / elapsed if elapsed else 0
+        sys.stdout.write(
+            f"Generated {count} pages in {elapsed:.2f}s ({rate:.1f} pages/s)\n"
+        )
+        modules = enerator.sitemap.sitemap_read()
+    if args.minify:
+        manifest = enerator.manifest.read_manifest(args.output)
+        entries = (manifest.get(module, {}) for module in modules)
+        sizes = [entry["minified"] for entry in entries if "minified" in entry]
+        sys.stdout.write(f"{enerator.minify.report(sizes)}\n")
+    if args.highlight_cache:
+        enerator.markdown.prune_highlight_store(enerator.markdown.HIGHLIGHT_STORE_DIR)
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile_out)
+    if args.profile:
+        sys.stdout.write(f"{enerator.timing.report(args.profile_top)}\n")
 
 
 @subcommand(())
+def daemon(args: Namespace) -> None:  # pragma: no cover
+    """Keep a build server running for enerator gen --daemon.
+
+    The server listens on a Unix socket in the build cache directory until
+    interrupted.
+
+    Args:
+        args: a Namespace object returned from argparse parser.
+    """
+    import enerator.daemon  # noqa:WPS433
+
+    with enerator.daemon.make_server() as server:
+        sys.stdout.write(f"Listening on {enerator.daemon.SOCKET_PATH}\n")
+        sys.stdout.flush()
+        with contextlib.suppress(KeyboardInterrupt):
+            server.serve_forever()
+
+
+@subcommand(
+    (
+        Cmdargs(
+            ("-r", "--render"),
+            "render pages in a pool of threads or processes",
+            default="thread",
+            choices=RENDER_POOLS,
+        ),
+        Cmdargs(("-w", "--workers"), "number of render workers (default: 4)", int),
+    )
+)
 def preview(args: Namespace) -> None:  # pragma: no cover
     """Generate page(s).
 
     Args:
         args: a Namespace object returned from argparse parser.
     """
+    import enerator.preview  # noqa:WPS433
+
+    workers = args.workers or enerator.preview.RENDER_WORKERS
+    enerator.preview.set_render_pool(args.render, workers)
     enerator.preview.preview_page().run()
 
 
@@ -0,0 +1,155 @@
+"""Long-lived build server for fast rebuilds.
+
+enerator daemon keeps Pygments, cmarkgfm, page modules, lexers and the
+highlight cache loaded between builds, and answers build requests from
+enerator gen --daemon over a Unix socket in the build cache directory.
+
+Requests and responses are single lines of JSON. A request carries the
+options of a gen command; the response carries what the command would
+have printed and its exit status. Before each build, project modules
+whose source changed are dropped from sys.modules, along with the
+modules that use them, so that they are imported afresh.
+"""
+
+import contextlib
+import io
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import sys
+import traceback
+import typing
+from argparse import Namespace
+
+from enerator.cache import CACHE_DIR
+from enerator.deps import record_modules, refresh_modules
+
+SOCKET_PATH = CACHE_DIR / "daemon.sock"
+PATH_ARGS = ("output", "profile_out")
+
+
+class DaemonUnavailable(Exception):
+    """No build daemon is listening."""
+
+
+def build(options: dict) -> typing.Tuple[str, int]:
+    """Run a gen command in this process.
+
+    Args:
+        options: attributes of the gen command's argparse Namespace
+
+    Returns:
+        the command's output and exit status
+    """
+    import enerator.commands  # noqa:WPS433
+    import enerator.generate  # noqa:WPS433
+
+    refresh_modules()
+    enerator.generate.all_urls.cache_clear()
+    enerator.generate.routes.cache_clear()
+    args = Namespace(**options)
+    for name in PATH_ARGS:
+        path = getattr(args, name, None)
+        setattr(args, name, pathlib.Path(path) if path else None)
+    args.daemon = False
+    output = io.StringIO()
+    status = 0
+    with contextlib.redirect_stdout(output):
+        try:
+            enerator.commands.gen(args)
+        except SystemExit as error:
+            status = error.code if isinstance(error.code, int) else 1
+        except Exception:
+            output.write(traceback.format_exc())
+            status = 1
+    record_modules()
+    return (output.getvalue(), status)
+
+
+class BuildHandler(socketserver.StreamRequestHandler):
+    """Answer one build request."""
+
+    def handle(self) -> None:
+        """Read a request line, build, and write a response line."""
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        if os.path.realpath(request["cwd"]) != os.path.realpath(os.getcwd()):
+            output, status = (f"daemon is serving {os.getcwd()}\n", 1)
+        else:
+            output, status = build(request["options"])
+        response = {"output": output, "status": status}
+        self.wfile.write(f"{json.dumps(response)}\n".encode())
+
+
+class BuildServer(socketserver.UnixStreamServer):
+    """Unix socket server that handles builds one at a time."""
+
+    def server_close(self) -> None:
+        """Close the socket and remove its file."""
+        super().server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(str(self.server_address))
+
+
+def make_server(path: pathlib.Path = SOCKET_PATH) -> BuildServer:
+    """Listen for build requests.
+
+    A socket file left behind by a daemon that is no longer running is
+    replaced.
+
+    Args:
+        path: socket path
+
+    Returns:
+        the server; call serve_forever()
+
+    Raises:
+        RuntimeError: if a daemon is already listening
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        with contextlib.suppress(OSError):
+            with socket.socket(socket.AF_UNIX) as probe:
+                probe.connect(str(path))
+                raise RuntimeError(f"a daemon is already listening on {path}")
+        path.unlink()
+    import enerator.commands  # noqa:WPS433,F401
+    import enerator.generate  # noqa:WPS433,F401
+
+    return BuildServer(str(path), BuildHandler)
+
+
+def request(args: Namespace, path: pathlib.Path = SOCKET_PATH) -> int:
+    """Have the daemon run a gen command, printing its output.
+
+    Args:
+        args: the gen command's argparse Namespace
+        path: socket path
+
+    Returns:
+        the command's exit status
+
+    Raises:
+        DaemonUnavailable: if no daemon is listening, or it closed the
+            connection without replying
+    """
+    options = {
+        name: str(value) if isinstance(value, pathlib.PurePath) else value
+        for name, value in vars(args).items()
+        if name not in {"func", "daemon"}
+    }
+    payload = json.dumps({"cwd": os.getcwd(), "options": options})
+    try:
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(str(path))
+            client.sendall(f"{payload}\n".encode())
+            with client.makefile("rb") as stream:
+                response = json.loads(stream.readline())
+    except (FileNotFoundError, ConnectionError, ValueError) as error:
+        raise DaemonUnavailable(str(path)) from error
+    sys.stdout.write(response["output"])
+    return response["status"]
@@ -0,0 +1,334 @@
+"""Recording the files a page depends on.
+
+While a page is loaded and rendered, every file it opens for reading is
+noted, using an audit hook; a module it imports is noted when its source
+or bytecode cache is read. Modules imported earlier, and so not imported
+again, are found by following the page module's globals to the modules
+they come from. Only files inside the project directory are kept; the
+standard library, installed packages and the build cache are ignored.
+
+The inputs of each page are stored in .enerator/deps.json, so both the
+preview server and incremental builds can tell which pages a changed file
+affects. Audit hooks need Python 3.8; on older versions only the modules
+found through the page module's globals are recorded.
+"""
+
+import contextlib
+import importlib.util
+import os
+import pathlib
+import sys
+import threading
+import types
+import typing
+
+from enerator.cache import CACHE_DIR, file_digest, read_json, write_json
+from enerator.sitemap import SITEMAP
+
+DEPS_GRAPH = CACHE_DIR / "deps.json"
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR
+
+local = threading.local()
+module_lock = threading.Lock()
+hooked = False
+digests: typing.Dict[str, typing.Optional[str]] = {}
+module_stamps: typing.Dict[str, typing.Optional[typing.Tuple[int, int]]] = {}
+
+
+def audit(event: str, args: tuple) -> None:
+    """Note files opened for reading by the recording thread.
+
+    Args:
+        event: audit event name
+        args: audit event arguments
+    """
+    found = getattr(local, "found", None)
+    if found is None:
+        return
+    if event == "open":
+        path, mode, flags = args
+        if mode is None:
+            reading = not flags & WRITE_FLAGS
+        else:
+            reading = not set(mode) - set("rbt")
+        if reading and isinstance(path, (str, bytes, os.PathLike)):
+            found.add(source_path(os.fsdecode(path)))
+
+
+def note(path: str) -> None:
+    """Record a file the page being rendered depends on, without reading it.
+
+    Args:
+        path: file path
+    """
+    found = getattr(local, "found", None)
+    if found is not None:
+        found.add(path)
+
+
+def source_path(filename: str) -> str:
+    """Map a cached bytecode file to the source it was compiled from.
+
+    Imports read the bytecode cache rather than the source when it is
+    current, so this is how imported modules are recorded.
+
+    Args:
+        filename: path of a file that was opened
+
+    Returns:
+        the source path for bytecode in __pycache__, else the path itself
+    """
+    if filename.endswith(".pyc") and "__pycache__" in filename:
+        with contextlib.suppress(ValueError):
+            return importlib.util.source_from_cache(filename)
+    return filename
+
+
+def install() -> None:
+    """Install the audit hook, once per process."""
+    global hooked  # noqa:WPS420
+    if not hooked and hasattr(sys, "addaudithook"):
+        sys.addaudithook(audit)  # type: ignore
+        hooked = True  # noqa:WPS442
+
+
+@contextlib.contextmanager
+def recording(found: typing.Set[str]) -> typing.Iterator[typing.Set[str]]:
+    """Record the files this thread reads and imports.
+
+    Args:
+        found: set to add file paths to
+
+    Yields:
+        the same set
+    """
+    install()
+    outer = getattr(local, "found", None)
+    local.found = found
+    try:
+        yield found
+    finally:
+        local.found = outer
+
+
+def recorded_iter(
+    iterable: typing.Iterable, found: typing.Set[str]
+) -> typing.Iterator:
+    """Record dependencies only while producing each item of an iterable.
+
+    Writing the items out is not recorded.
+
+    Args:
+        iterable: items, such as the pieces of a rendered page
+        found: set to add file paths to
+
+    Yields:
+        the same items
+    """
+    iterator = iter(iterable)
+    while True:
+        with recording(found):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def module_files(module: types.ModuleType) -> typing.Set[str]:
+    """Find the source files of a module and the modules it uses.
+
+    Modules are followed through the module's globals: imported modules,
+    and the modules that imported functions and classes are defined in.
+
+    Args:
+        module: loaded module
+
+    Returns:
+        source file paths
+    """
+    files = set()
+    pending = [module]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        filename = getattr(current, "__file__", None)
+        if not filename or not is_project_file(filename):
+            continue
+        files.add(filename)
+        for member in vars(current).values():
+            if not isinstance(member, types.ModuleType):
+                member = sys.modules.get(getattr(member, "__module__", None) or "")
+            if member is not None:
+                pending.append(member)
+    return files
+
+
+def is_project_file(filename: str) -> bool:
+    """Check whether a file belongs to the site being built.
+
+    Args:
+        filename: file path
+
+    Returns:
+        True for files inside the current directory, outside the build cache
+        and any installed packages
+    """
+    path = pathlib.Path(filename).resolve()
+    root = pathlib.Path.cwd()
+    if root not in path.parents:
+        return False
+    parts = path.relative_to(root).parts
+    return (
+        parts[0] != CACHE_DIR.name
+        and "site-packages" not in parts
+        and "__pycache__" not in parts
+    )
+
+
+def project_files(found: typing.Iterable[str]) -> typing.List[str]:
+    """Keep the project files among recorded paths.
+
+    Args:
+        found: recorded file paths
+
+    Returns:
+        sorted paths relative to the current directory
+    """
+    root = pathlib.Path.cwd()
+    kept = set()
+    for filename in found:
+        if os.path.isfile(filename) and is_project_file(filename):
+            kept.add(str(pathlib.Path(filename).resolve().relative_to(root)))
+    return sorted(kept)
+
+
+def page_deps(module: str, found: typing.Set[str]) -> typing.List[str]:
+    """Combine recorded files with the page module's own imports.
+
+    Files shared by every page, which only the first page to load them
+    would otherwise record, are always included: the sitemap and the
+    packages containing the page module.
+
+    Args:
+        module: string form of Python module name
+        found: file paths recorded while loading and rendering the page
+
+    Returns:
+        sorted paths relative to the current directory
+    """
+    shared = {str(SITEMAP)}
+    parts = module.split(".")
+    for depth in range(1, len(parts)):
+        package = sys.modules.get(".".join(parts[:depth]))
+        filename = getattr(package, "__file__", None)
+        if filename:
+            shared.add(filename)
+    page = sys.modules.get(module)
+    if page is not None:
+        shared |= module_files(page)
+    return project_files(found | shared)
+
+
+def dep_digest(path: str) -> typing.Optional[str]:
+    """Hash a recorded input, reading each file once per build.
+
+    Args:
+        path: file path relative to the current directory
+
+    Returns:
+        hex digest of the file contents, or None if the file does not exist
+    """
+    if path not in digests:
+        digests[path] = file_digest(pathlib.Path(path))
+    return digests[path]
+
+
+def reset_digests() -> None:
+    """Forget hashes of recorded inputs, at the start of a build."""
+    digests.clear()
+
+
+def read_graph() -> typing.Dict[str, typing.List[str]]:
+    """Load the recorded inputs of every page.
+
+    Returns:
+        input file paths keyed by module name
+    """
+    return read_json(DEPS_GRAPH)
+
+
+def update_graph(deps: typing.Mapping[str, typing.Iterable[str]]) -> None:
+    """Store the recorded inputs of some pages.
+
+    Args:
+        deps: input file paths keyed by module name
+    """
+    graph = read_graph()
+    updated = {**graph, **{module: sorted(paths) for module, paths in deps.items()}}
+    if updated != graph:
+        write_json(DEPS_GRAPH, updated)
+
+
+def module_stamp(module: typing.Any) -> typing.Optional[typing.Tuple[int, int]]:
+    """Check when the source of a loaded module last changed.
+
+    Args:
+        module: loaded module
+
+    Returns:
+        modification time in nanoseconds and size, or None if the file is
+        missing
+    """
+    try:
+        stat = os.stat(module.__file__)
+    except (FileNotFoundError, TypeError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def project_modules() -> typing.Dict[str, typing.Any]:
+    """Find the loaded modules that belong to the site being built.
+
+    Returns:
+        modules keyed by name
+    """
+    modules = {}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename and is_project_file(filename):
+            modules[name] = module
+    return modules
+
+
+def refresh_modules() -> typing.List[str]:
+    """Unload project modules whose source changed since it was recorded.
+
+    Modules that use a changed module, directly or through others, are
+    unloaded too, so no page keeps a reference to stale code. Only modules
+    whose stamps were noted by record_modules() are checked. Callers that
+    load modules on several threads hold module_lock.
+
+    Returns:
+        names of the unloaded modules
+    """
+    modules = project_modules()
+    changed = {
+        module.__file__
+        for name, module in modules.items()
+        if name in module_stamps and module_stamps[name] != module_stamp(module)
+    }
+    stale = [name for name, module in modules.items() if changed & module_files(module)]
+    for name in stale:
+        sys.modules.pop(name, None)
+        module_stamps.pop(name, None)
+    return stale
+
+
+def record_modules() -> None:
+    """Remember the source stamps of loaded project modules."""
+    for name, module in project_modules().items():
+        module_stamps.setdefault(name, module_stamp(module))
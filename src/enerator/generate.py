@@ -1,13 +1,31 @@
 """Simple Static Site Generator using Python."""
 
+import asyncio
+import collections
 import functools
 import importlib
+import json
 import pathlib
 import sys
+import time
+import types
 import typing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import repeat
 
+import enerator.assets
+import enerator.deps
+import enerator.markdown
+import enerator.minify
+import enerator.timing
 from enerator.add import module_to_path
+from enerator.cache import digest
+from enerator.manifest import is_current, page_inputs, read_manifest, write_manifest
+from enerator.output import OutputWriter
 from enerator.sitemap import sitemap_read
+from enerator.urlindex import url_index
+
+PIPELINE_QUEUE_SIZE = 8
 
 sys.path = list(dict.fromkeys(("", *sys.path)))
 
@@ -25,15 +43,20 @@ def link_name(module: str) -> str:
 
 
 @functools.lru_cache(maxsize=2)
-def all_urls() -> dict:
+def all_urls() -> typing.Mapping[str, str]:
     """Generate all links to all pages in sitemap.
 
+    The table is built once and shared, read-only, by every page.
+
     Returns:
-        A dict of all page urls
+        A mapping of all page urls
     """
-    return {link_name(module): url_for(module) for module in sitemap_read()}
+    return types.MappingProxyType(
+        {link_name(module): path for module, path in url_index().items()}
+    )
 
 
+@enerator.timing.timed("load_module")
 def load_module(
     module: str, devmode: bool = False
 ) -> typing.Tuple[dict, typing.Callable]:
@@ -70,6 +93,30 @@ def url_for(module: str) -> str:
     return rel["path"]
 
 
+class PageContext(typing.NamedTuple):
+    """A page resolved once per build and shared by every generation stage."""
+
+    module: str
+    config: dict
+    page: typing.Callable
+    modpath: pathlib.Path
+    urls: typing.Mapping[str, str]
+
+
+def page_context(module: str, devmode: bool = False) -> PageContext:
+    """Load a page and resolve everything needed to generate it.
+
+    Args:
+        module: string form of Python module name
+        devmode: live reload if True
+
+    Returns:
+        the page's context
+    """
+    config, page = load_module(module, devmode)
+    return PageContext(module, config, page, module_to_path(module), all_urls())
+
+
 @functools.lru_cache(maxsize=2)
 def routes() -> dict:
     """Generate all links to all pages in sitemap.
@@ -77,7 +124,45 @@ def routes() -> dict:
     Returns:
         A dict of all page urls
     """
-    return {url_for(module): module for module in sitemap_read()}
+    return {path: module for module, path in url_index().items()}
+
+
+def render_iter(context: PageContext, rel: dict) -> typing.Iterator[str]:
+    """Generate content in pieces for an already loaded page.
+
+    A page() function may return either a string or an iterable of strings,
+    such as the output of md_highlight_and_parse_iter(). Its argument is a
+    ChainMap of the page's own information over the shared URL table, so the
+    table is not copied for each page.
+
+    Args:
+        context: the page's context
+        rel: dict with related information
+
+    Yields:
+        generated page text, piece by piece
+    """
+    local = {**rel, "modpath": context.modpath}
+    # ChainMap only ever writes to its first map, so the table stays read-only
+    urls = typing.cast(typing.MutableMapping[str, str], context.urls)
+    content = context.page(collections.ChainMap(local, urls))
+    if isinstance(content, str):
+        yield content
+    else:
+        yield from content
+
+
+def generate_page_iter(module: str, rel: dict) -> typing.Iterator[str]:
+    """Generate page content in pieces.
+
+    Args:
+        module: string form of Python module name
+        rel: dict with related information
+
+    Returns:
+        generated page text, piece by piece
+    """
+    return render_iter(page_context(module, rel.get("devmode", False)), rel)
 
 
 def generate_page(module: str, rel: dict) -> str:
@@ -90,26 +175,512 @@ def generate_page(module: str, rel: dict) -> str:
     Returns:
         generated page text
     """
-    rel["modpath"] = module_to_path(module)
-    rel = {**rel, **all_urls()}
-    _, page = load_module(module, rel.get("devmode", False))
-    return page(rel)
+    return "".join(generate_page_iter(module, rel))
+
+
+def urls_digest() -> str:
+    """Hash the URL table and build settings shared by all pages.
+
+    Fingerprinted asset URLs are not included: each page records the
+    assets it looks up among its inputs instead.
+
+    Returns:
+        hex digest of the page URLs, asset fingerprinting and minification
+        settings
+    """
+    minify = (enerator.minify.enabled, enerator.minify.short_classes)
+    settings = (dict(all_urls()), enerator.assets.fingerprints, *minify)
+    return digest(json.dumps(settings, sort_keys=True).encode())
+
+
+def build_page(
+    module: str,
+    writer: OutputWriter,
+    entry: typing.Optional[dict] = None,
+    urls: str = "",
+) -> typing.Tuple[pathlib.Path, dict]:
+    """Generate page unless its manifest entry shows it is up to date.
+
+    Args:
+        module: string form of Python module name
+        writer: writer for the output directory
+        entry: manifest entry for this page from the previous build
+        urls: hash of the current URL table
+
+    Returns:
+        Full path to generated filename and the page's new manifest entry
+    """
+    if entry and is_current(entry, urls):
+        output_path = pathlib.Path(entry["path"])
+        writer.keep(output_path)
+        return (output_path, kept_entry(entry))
+    enerator.timing.set_page(module)
+    start = time.perf_counter()
+    found: typing.Set[str] = set()
+    with enerator.deps.recording(found):
+        context = page_context(module)
+    config = context.config
+    watchlist = config.get("watch", [])
+    inputs = page_inputs(module, watchlist, context.modpath)
+    pieces = enerator.timing.timed_iter(
+        "generate_page",
+        enerator.deps.recorded_iter(render_iter(context, config), found),
+    )
+    chunks: typing.Iterator[bytes] = (piece.encode() for piece in pieces)
+    sizes = None
+    if enerator.minify.enabled:
+        content, sizes = minified("".join(pieces))
+        chunks = iter((content,))
+    rendered = enerator.timing.page_times.get(module, {}).get("generate_page", 0)
+    write_start = time.perf_counter()
+    output_path, output_digest = writer.write(page_relpath(config), chunks)
+    if enerator.timing.enabled:
+        stages = enerator.timing.page_times.get(module, {})
+        end = time.perf_counter()
+        streamed = stages.get("generate_page", 0) - rendered
+        enerator.timing.record("write", end - write_start - streamed)
+        enerator.timing.record("total", end - start)
+    entry = page_entry(context, inputs, found, urls)
+    entry.update(output=output_digest, path=str(output_path))
+    if sizes:
+        entry["minified"] = sizes
+    return (output_path, entry)
+
+
+def kept_entry(entry: dict) -> dict:
+    """Carry a skipped page's manifest entry over to the new manifest.
+
+    Minified sizes are dropped, as they are only recorded by the build that
+    minified the page.
+
+    Args:
+        entry: manifest entry from the previous build
+
+    Returns:
+        the page's new manifest entry
+    """
+    return {key: value for key, value in entry.items() if key != "minified"}
+
+
+def page_relpath(config: dict) -> str:
+    """Find where a page is written below the output directory.
+
+    Args:
+        config: the page's CONFIG dict
+
+    Returns:
+        relative path of the page's index.html
+    """
+    return f"{config['path'].strip('/')}/index.html".lstrip("/")
+
+
+def minified(html: str) -> typing.Tuple[bytes, typing.List[int]]:
+    """Minify a rendered page.
+
+    Args:
+        html: generated page text
+
+    Returns:
+        the minified page, and its size before and after minification
+    """
+    content = enerator.minify.minify(html).encode()
+    return (content, [len(html.encode()), len(content)])
+
+
+def page_entry(
+    context: PageContext, inputs: dict, found: typing.Set[str], urls: str
+) -> dict:
+    """Start a page's manifest entry from what went into it.
+
+    Args:
+        context: the page's context
+        inputs: hashes of the page's source and watched files
+        found: files recorded while loading and rendering the page
+        urls: hash of the current URL table
+
+    Returns:
+        manifest entry, without the output path and hash
+    """
+    watchlist = context.config.get("watch", [])
+    found.update(str(context.modpath.joinpath(path)) for path in watchlist)
+    deps = enerator.deps.page_deps(context.module, found)
+    return {
+        **inputs,
+        "deps": {path: enerator.deps.dep_digest(path) for path in deps},
+        "module": context.module,
+        "urls": urls,
+    }
+
+
+def init_worker(
+    highlight_store: typing.Optional[pathlib.Path],
+    timed: bool,
+    minify: typing.Tuple[bool, bool] = (False, False),
+    asset_urls: typing.Optional[typing.Mapping[str, str]] = None,
+) -> None:
+    """Carry settings from the parent process into a worker process.
+
+    Args:
+        highlight_store: on-disk highlight store, if enabled
+        timed: whether build timing is enabled
+        minify: whether pages are minified, and with short classes
+        asset_urls: published asset URLs, keyed by plain URL
+    """
+    enerator.markdown.set_highlight_store(highlight_store)
+    enerator.timing.enable(timed)
+    enerator.minify.configure(*minify)
+    enerator.assets.set_urls(asset_urls or {})
+
+
+def build_page_timed(
+    module: str,
+    writer: OutputWriter,
+    entry: typing.Optional[dict] = None,
+    urls: str = "",
+) -> typing.Tuple[pathlib.Path, dict, dict]:
+    """Generate page in a worker process, passing back its timings.
+
+    Args:
+        module: string form of Python module name
+        writer: writer for the output directory; writes synchronously here
+        entry: manifest entry for this page from the previous build
+        urls: hash of the current URL table
+
+    Returns:
+        Full path to generated filename, new manifest entry and stage timings
+    """
+    output_path, new_entry = build_page(module, writer, entry, urls)
+    return (output_path, new_entry, enerator.timing.page_times.pop(module, {}))
+
+
+def write_static(writer: OutputWriter) -> None:
+    """Write the assets and stylesheets that generated pages depend on.
+
+    Assets are published first, so pages can look up their URLs. Pages
+    minified with short classes need the matching highlight styles.
+
+    Args:
+        writer: writer for the output directory
+    """
+    enerator.assets.set_urls(enerator.assets.publish_assets(writer))
+    if enerator.minify.short_classes:
+        css = enerator.minify.highlight_css()
+        writer.write(enerator.minify.CSS_FILE, (css.encode(),))
 
 
-def generate(module: str, out: pathlib.Path) -> pathlib.Path:
+def generate(
+    module: str,
+    out: pathlib.Path,
+    force: bool = False,
+    encodings: typing.Iterable[str] = (),
+) -> pathlib.Path:
     """Generate page.
 
     Args:
         module: string form of Python module name
         out: output directory for static site
+        force: regenerate even if the page is unchanged since the last build
+        encodings: content encodings, such as "gzip", to precompress output in
 
     Returns:
         Full path to generated filename
     """
-    rel, page = load_module(module)
-    output_dir = (out / rel["path"][1:]).resolve()
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / "index.html"
-    web_content = generate_page(module, rel)
-    output_path.write_text(web_content)
+    enerator.deps.reset_digests()
+    manifest = read_manifest(out)
+    entry = None if force else manifest.get(module)
+    with OutputWriter(out, workers=0, encodings=encodings) as writer:
+        write_static(writer)
+        output_path, manifest[module] = build_page(module, writer, entry, urls_digest())
+    write_manifest(out, manifest)
+    enerator.deps.update_graph({module: manifest[module].get("deps", {})})
     return output_path
+
+
+def generate_site(
+    out: pathlib.Path,
+    jobs: int = 1,
+    force: bool = False,
+    staged: bool = False,
+    encodings: typing.Iterable[str] = (),
+) -> typing.List[pathlib.Path]:
+    """Generate every page listed in the sitemap.
+
+    Pages are rendered serially when jobs is 1, otherwise spread over a pool
+    of worker processes. Either way the output is the same as calling
+    generate() for each page in turn. Pages whose inputs, including the
+    files and modules recorded while rendering them, are unchanged since
+    the last build are skipped unless force is set. When rendering serially,
+    files are written by a pool of I/O threads while later pages render.
+    Changed assets are copied into the output before any page renders.
+
+    Args:
+        out: output directory for static site
+        jobs: number of worker processes
+        force: regenerate every page, ignoring the build manifest
+        staged: build into a new directory and swap it in once complete, so
+            a failed build leaves the previous site intact
+        encodings: content encodings, such as "gzip", to precompress output in
+
+    Returns:
+        Full paths to generated filenames, in sitemap order
+    """
+    modules = sitemap_read()
+    enerator.deps.reset_digests()
+    manifest = {} if force else read_manifest(out)
+    previous = [manifest.get(module) for module in modules]
+    with OutputWriter(out, staged=staged, encodings=encodings) as writer:
+        write_static(writer)
+        urls = urls_digest()
+        results = build_pages(modules, writer, previous, urls, jobs)
+    entries = [entry for _, entry in results]
+    write_manifest(out, dict(zip(modules, entries)))
+    enerator.deps.update_graph(
+        {module: entry.get("deps", {}) for module, entry in zip(modules, entries)}
+    )
+    return [output_path for output_path, _ in results]
+
+
+def build_pages(
+    modules: typing.List[str],
+    writer: OutputWriter,
+    entries: typing.List[typing.Optional[dict]],
+    urls: str,
+    jobs: int,
+) -> typing.List[typing.Tuple[pathlib.Path, dict]]:
+    """Generate pages serially or in worker processes.
+
+    Args:
+        modules: string forms of Python module names
+        writer: writer for the output directory
+        entries: manifest entries from the previous build, one per module
+        urls: hash of the current URL table
+        jobs: number of worker processes
+
+    Returns:
+        Full path to generated filename and new manifest entry, per module
+    """
+    if jobs <= 1 or len(modules) <= 1:
+        return list(map(build_page, modules, repeat(writer), entries, repeat(urls)))
+    chunksize = max(1, len(modules) // (jobs * 4))
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(
+            enerator.markdown.highlight_store,
+            enerator.timing.enabled,
+            (enerator.minify.enabled, enerator.minify.short_classes),
+            enerator.assets.urls,
+        ),
+    ) as executor:
+        timed_results = list(
+            executor.map(
+                build_page_timed,
+                modules,
+                repeat(writer),
+                entries,
+                repeat(urls),
+                chunksize=chunksize,
+            )
+        )
+    results = []
+    for module, (output_path, entry, timings) in zip(modules, timed_results):
+        if timings:
+            enerator.timing.page_times[module] = timings
+        results.append((output_path, entry))
+    return results
+
+
+class PageJob(typing.NamedTuple):
+    """A page on its way through the build pipeline."""
+
+    position: int
+    module: str
+    found: typing.Set[str]
+    context: typing.Optional[PageContext] = None
+    inputs: typing.Optional[dict] = None
+    html: str = ""
+    content: bytes = b""
+    sizes: typing.Optional[typing.List[int]] = None
+    entry: typing.Optional[dict] = None
+
+
+def load_job(job: PageJob) -> PageJob:
+    """Load a page module and hash the page's inputs.
+
+    Args:
+        job: page to load
+
+    Returns:
+        the page with its context and inputs
+    """
+    with enerator.deps.recording(job.found):
+        context = page_context(job.module)
+    inputs = page_inputs(job.module, context.config.get("watch", []), context.modpath)
+    return job._replace(context=context, inputs=inputs)
+
+
+def render_job(job: PageJob) -> PageJob:
+    """Render a loaded page.
+
+    Args:
+        job: loaded page
+
+    Returns:
+        the page with its HTML
+    """
+    context = typing.cast(PageContext, job.context)
+    pieces = render_iter(context, context.config)
+    with enerator.deps.recording(job.found):
+        html = "".join(pieces)
+    return job._replace(html=html)
+
+
+def finish_job(job: PageJob) -> PageJob:
+    """Minify a rendered page if enabled, and encode it.
+
+    Args:
+        job: rendered page
+
+    Returns:
+        the page with its content to write, and its minified sizes if any
+    """
+    if enerator.minify.enabled:
+        content, sizes = minified(job.html)
+        return job._replace(html="", content=content, sizes=sizes)
+    return job._replace(html="", content=job.html.encode())
+
+
+def write_job(job: PageJob, writer: OutputWriter, urls: str) -> PageJob:
+    """Write a finished page and make its manifest entry.
+
+    Args:
+        job: finished page
+        writer: writer for the output directory
+        urls: hash of the current URL table
+
+    Returns:
+        the page with its new manifest entry
+    """
+    context = typing.cast(PageContext, job.context)
+    relpath = page_relpath(context.config)
+    output_path, output_digest = writer.write(relpath, (job.content,))
+    entry = page_entry(context, typing.cast(dict, job.inputs), job.found, urls)
+    entry.update(output=output_digest, path=str(output_path))
+    if job.sizes:
+        entry["minified"] = job.sizes
+    return PageJob(job.position, job.module, job.found, entry=entry)
+
+
+async def run_stage(
+    step: typing.Callable[[PageJob], PageJob],
+    inbox: asyncio.Queue,
+    outbox: asyncio.Queue,
+    executor: typing.Optional[Executor] = None,
+) -> None:
+    """Pass pages through one pipeline stage until None arrives.
+
+    Args:
+        step: blocking function that takes a page to the next stage
+        inbox: queue of pages for this stage
+        outbox: queue for the next stage, which blocks this one when full
+        executor: executor to run the step in; the loop's default if None
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await inbox.get()
+        if job is None:
+            break
+        await outbox.put(await loop.run_in_executor(executor, step, job))
+    await outbox.put(None)
+
+
+async def generate_site_async(
+    out: pathlib.Path,
+    force: bool = False,
+    staged: bool = False,
+    encodings: typing.Iterable[str] = (),
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    executor: typing.Optional[Executor] = None,
+) -> typing.List[pathlib.Path]:
+    """Generate every page listed in the sitemap, as a pipeline.
+
+    Pages pass through five stages: pages are resolved from the sitemap
+    and the manifest, then loaded, rendered, minified if enabled, and
+    written. Each stage runs its blocking work in the executor, so a page
+    is written while the next renders and the one after loads. Stages are
+    joined by queues of queue_size pages, and a stage waits while the next
+    one's queue is full, so however large the site, only a few rendered
+    pages are held in memory. Pages that are up to date are skipped, as in
+    generate_site(), whose output this matches. Per-page timings are not
+    recorded.
+
+    Args:
+        out: output directory for static site
+        force: regenerate every page, ignoring the build manifest
+        staged: build into a new directory and swap it in once complete, so
+            a failed build leaves the previous site intact
+        encodings: content encodings, such as "gzip", to precompress output in
+        queue_size: number of pages that may wait between two stages
+        executor: thread pool executor for blocking work; the loop's default
+            if None
+
+    Returns:
+        Full paths to generated filenames, in sitemap order
+    """
+    loop = asyncio.get_running_loop()
+    modules = sitemap_read()
+    enerator.deps.reset_digests()
+    manifest = {} if force else read_manifest(out)
+    entries: typing.List[dict] = [{} for _ in modules]
+    with OutputWriter(out, workers=0, staged=staged, encodings=encodings) as writer:
+        await loop.run_in_executor(executor, write_static, writer)
+        urls = urls_digest()
+        queues: typing.List[asyncio.Queue] = [
+            asyncio.Queue(maxsize=queue_size) for _ in range(5)
+        ]
+        steps: typing.Tuple[typing.Callable[[PageJob], PageJob], ...] = (
+            load_job,
+            render_job,
+            finish_job,
+            functools.partial(write_job, writer=writer, urls=urls),
+        )
+
+        async def resolve() -> None:
+            for position, module in enumerate(modules):
+                entry = manifest.get(module)
+                if entry and is_current(entry, urls):
+                    entries[position] = kept_entry(entry)
+                    path = pathlib.Path(entry["path"])
+                    await loop.run_in_executor(executor, writer.keep, path)
+                else:
+                    await queues[0].put(PageJob(position, module, set()))
+            await queues[0].put(None)
+
+        async def collect() -> None:
+            while True:
+                job = await queues[-1].get()
+                if job is None:
+                    break
+                entries[job.position] = job.entry
+
+        tasks = [
+            asyncio.ensure_future(stage)
+            for stage in (
+                resolve(),
+                *(
+                    run_stage(step, inbox, outbox, executor)
+                    for step, inbox, outbox in zip(steps, queues, queues[1:])
+                ),
+                collect(),
+            )
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+    write_manifest(out, dict(zip(modules, entries)))
+    enerator.deps.update_graph(
+        {module: entry.get("deps", {}) for module, entry in zip(modules, entries)}
+    )
+    return [pathlib.Path(entry["path"]) for entry in entries]
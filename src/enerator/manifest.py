@@ -0,0 +1,116 @@
+"""Build manifest for incremental generation.
+
+For each page, the manifest records hashes of everything that went into
+it: the module source, the files in its CONFIG["watch"] list, the files
+and modules recorded while rendering it, the URL table, and the generated
+output. A page whose recorded hashes still
+match does not need to be rendered again.
+"""
+
+import importlib.util
+import pathlib
+import typing
+
+from enerator.add import module_to_path
+from enerator.cache import CACHE_DIR, file_digest, read_json, write_json
+from enerator.deps import dep_digest
+
+MANIFEST = CACHE_DIR / "manifest.json"
+
+
+def read_manifest(out: pathlib.Path) -> dict:
+    """Load manifest entries for an output directory.
+
+    Args:
+        out: output directory for static site
+
+    Returns:
+        dict of manifest entries keyed by module name
+    """
+    return read_json(MANIFEST).get(str(out.resolve()), {})
+
+
+def write_manifest(out: pathlib.Path, entries: dict) -> None:
+    """Save manifest entries for an output directory.
+
+    Args:
+        out: output directory for static site
+        entries: dict of manifest entries keyed by module name
+    """
+    manifest = read_json(MANIFEST)
+    manifest[str(out.resolve())] = entries
+    write_json(MANIFEST, manifest)
+
+
+def module_source(
+    module: str, modpath: typing.Optional[pathlib.Path] = None
+) -> typing.Optional[pathlib.Path]:
+    """Find the source file of a module without importing it.
+
+    Page packages laid out by enerator add are found directly on the
+    filesystem; anything else is located through importlib.
+
+    Args:
+        module: string form of Python module name
+        modpath: the module's directory, if already known
+
+    Returns:
+        path to the module source, if found
+    """
+    dirpath = modpath or module_to_path(module)
+    for candidate in (dirpath / "__init__.py", dirpath.with_suffix(".py")):
+        if candidate.is_file():
+            return candidate
+    try:
+        spec = importlib.util.find_spec(module)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.origin:
+        return None
+    return pathlib.Path(spec.origin)
+
+
+def page_inputs(
+    module: str,
+    watchlist: typing.Iterable[str],
+    modpath: typing.Optional[pathlib.Path] = None,
+) -> dict:
+    """Hash the inputs of a page.
+
+    Args:
+        module: string form of Python module name
+        watchlist: paths relative to the module directory, as in CONFIG["watch"]
+        modpath: the module's directory, if already known
+
+    Returns:
+        dict with "source" and "watch" hashes
+    """
+    modpath = modpath or module_to_path(module)
+    source = module_source(module, modpath)
+    return {
+        "source": source and file_digest(source),
+        "watch": {path: file_digest(modpath.joinpath(path)) for path in watchlist},
+    }
+
+
+def is_current(entry: typing.Optional[dict], urls: str) -> bool:
+    """Check whether a manifest entry still matches its page's inputs.
+
+    Args:
+        entry: manifest entry from a previous build
+        urls: hash of the current URL table
+
+    Returns:
+        True if the page and its output are unchanged since the entry was made
+    """
+    if not entry or entry.get("urls") != urls:
+        return False
+    inputs = page_inputs(entry["module"], entry["watch"])
+    deps = entry.get("deps", {})
+    return (
+        inputs["source"] is not None
+        and inputs["source"] == entry["source"]
+        and inputs["watch"] == entry["watch"]
+        and all(dep_digest(path) == deps[path] for path in deps)
+        and file_digest(pathlib.Path(entry["path"])) == entry["output"]
+    )
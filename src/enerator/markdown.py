@@ -1,17 +1,77 @@
 """Markdown processing and syntax highlighting."""
 
+import contextlib
+import functools
+import json
+import os
+import pathlib
 import re
+import time
 import typing
 
 import cmarkgfm  # type: ignore
 import pygments  # type: ignore
 import pygments.formatters  # type: ignore
+import pygments.lexer  # type: ignore
 import pygments.lexers  # type: ignore
 
+from enerator.cache import CACHE_DIR, digest
+from enerator.timing import count, timed
+
 BRACE_RE = re.compile(r"{([^}]+)}")
-CODE_RE = re.compile(r"^```([a-z]+)?$(.+?)^```$", re.S | re.M)
 CMARK_FLAGS = 132096  # UNSAFE = 1 << 17; SMART = 1 << 10; CMARK_FLAGS = UNSAFE | SMART
 FORMATTER = pygments.formatters.HtmlFormatter()
+HIGHLIGHT_CACHE_SIZE = 1024
+STREAM_CHUNK_SIZE = 65536
+FENCE_RE = re.compile(r"( {0,3})(`{3,}|~{3,})(.*)", re.S)
+CLOSING_FENCE_RE = re.compile(r" {0,3}(`{3,}|~{3,})[ \t]*\r?\n?")
+LIST_ITEM_RE = re.compile(r"([-+*]|[0-9]{1,9}[.)])(\s|$)")
+LINK_DEF_RE = re.compile(r" {0,3}\[[^\]]+\]:")
+RAW_HTML_RE = re.compile(r" {0,3}<(pre|script|style|textarea|!--)", re.I)
+RAW_HTML_END = {
+    "pre": "</pre>",
+    "script": "</script>",
+    "style": "</style>",
+    "textarea": "</textarea>",
+    "!--": "-->",
+}
+HIGHLIGHT_STORE_DIR = CACHE_DIR / "highlight"
+HIGHLIGHT_STORE_MAX_AGE = 30 * 24 * 60 * 60  # unused for 30 days
+
+highlight_store: typing.Optional[pathlib.Path] = None
+store_stats = {"hits": 0, "misses": 0}
+
+
+class Fence(typing.NamedTuple):
+    """The opening line of a fenced code block."""
+
+    indent: int
+    marker: str
+    info: str
+
+
+class CodeBlock(typing.NamedTuple):
+    """A fenced code block."""
+
+    lang: typing.Optional[str]
+    code: str
+
+
+class Segment(typing.NamedTuple):
+    """Markdown text, followed by the code block that ends it, if any."""
+
+    text: str
+    block: typing.Optional[CodeBlock]
+
+
+class HighlightCacheInfo(typing.NamedTuple):
+    """Highlight cache statistics."""
+
+    hits: int
+    misses: int
+    store_hits: int
+    store_misses: int
+    currsize: int
 
 
 def escape_braces(text: str, pattern: typing.Pattern = BRACE_RE) -> str:
@@ -27,25 +87,230 @@ def escape_braces(text: str, pattern: typing.Pattern = BRACE_RE) -> str:
     return pattern.sub(r"{{\1}}", text)
 
 
-def md_codeblock(match: typing.Match) -> str:
-    """Substitution method to replace markdown code blocks with pygmented HTML.
+def set_highlight_store(path: typing.Optional[pathlib.Path]) -> None:
+    """Enable or disable the on-disk highlight store.
 
-    Should be called from substition (sub) regex method.
+    Highlighted blocks are saved as one file each under this directory, so
+    the store can be shared by parallel processes and successive builds.
 
     Args:
-        match: matched block
+        path: store directory, or None to disable
+    """
+    global highlight_store  # noqa:WPS420
+    highlight_store = path  # noqa:WPS442
+
+
+@functools.lru_cache(maxsize=None)
+def get_lexer(lang: typing.Optional[str]) -> pygments.lexer.Lexer:
+    """Look up a lexer by language name, once per language.
+
+    Args:
+        lang: language name or alias from the code fence
 
     Returns:
-        A string containing the highlighted (HTML) code block.
+        Pygments lexer, falling back to plain text for unknown languages
     """
-    lang, code = match.groups()
     try:
-        lexer = pygments.lexers.get_lexer_by_name(lang)
+        return pygments.lexers.get_lexer_by_name(lang)
     except ValueError:
-        lexer = pygments.lexers.TextLexer()
-    return pygments.highlight(code, lexer, FORMATTER)
+        return pygments.lexers.TextLexer()
+
+
+def highlight_key(lang: typing.Optional[str], code: str) -> str:
+    """Content address of a highlighted code block.
+
+    Args:
+        lang: language name
+        code: source code
+
+    Returns:
+        hex digest covering the code, language, formatter and Pygments version
+    """
+    options = sorted((key, repr(value)) for key, value in FORMATTER.options.items())
+    payload = json.dumps((lang, code, options, pygments.__version__))
+    return digest(payload.encode())
+
+
+@functools.lru_cache(maxsize=HIGHLIGHT_CACHE_SIZE)
+def highlight(lang: typing.Optional[str], code: str) -> str:
+    """Highlight code, using the on-disk store if enabled.
+
+    Args:
+        lang: language name
+        code: source code
+
+    Returns:
+        A string containing the highlighted (HTML) code block.
+    """
+    store = highlight_store
+    if store is None:
+        count("highlight_rendered")
+        return pygments.highlight(code, get_lexer(lang), FORMATTER)
+    key = highlight_key(lang, code)
+    path = store / key[:2] / key
+    try:
+        html = path.read_text()
+    except FileNotFoundError:
+        store_stats["misses"] += 1
+    else:
+        store_stats["hits"] += 1
+        count("highlight_store_hits")
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return html
+    count("highlight_rendered")
+    html = pygments.highlight(code, get_lexer(lang), FORMATTER)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{key}.{os.getpid()}.tmp")
+    tmp_path.write_text(html)
+    os.replace(tmp_path, path)
+    return html
+
+
+def highlight_cache_info() -> HighlightCacheInfo:
+    """Report highlight cache effectiveness in this process.
+
+    Returns:
+        hit and miss counts for the in-memory and on-disk layers
+    """
+    info = highlight.cache_info()
+    return HighlightCacheInfo(
+        info.hits,
+        info.misses,
+        store_stats["hits"],
+        store_stats["misses"],
+        info.currsize,
+    )
+
+
+def prune_highlight_store(
+    store: pathlib.Path, max_age: float = HIGHLIGHT_STORE_MAX_AGE
+) -> int:
+    """Remove highlighted blocks that have not been used for a while.
+
+    Reading a block from the store refreshes its modification time, so
+    blocks still in use are kept however old they are.
+
+    Args:
+        store: store directory
+        max_age: seconds since last use after which a block is removed
+
+    Returns:
+        number of files removed
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in store.glob("*/*"):
+        with contextlib.suppress(FileNotFoundError):
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+    return removed
+
+
+def open_fence(line: str) -> typing.Optional[Fence]:
+    """Check whether a line opens a fenced code block.
 
+    Following CommonMark, the fence is three or more backticks or tildes
+    indented by at most three spaces, and the info string of a backtick
+    fence may not contain backticks.
 
+    Args:
+        line: a line of Markdown, with or without its line ending
+
+    Returns:
+        the fence, if the line opens one
+    """
+    fence = FENCE_RE.match(line)
+    if fence is None:
+        return None
+    indent, marker, info = fence.groups()
+    if marker[0] == "`" and "`" in info:
+        return None
+    return Fence(len(indent), marker, info.strip())
+
+
+def closes_fence(line: str, fence: Fence) -> bool:
+    """Check whether a line closes a fenced code block.
+
+    Args:
+        line: a line of Markdown, with or without its line ending
+        fence: the opening fence
+
+    Returns:
+        True for a run of the fence character at least as long as the
+        opening fence, indented by at most three spaces and followed only
+        by spaces or tabs
+    """
+    closing = CLOSING_FENCE_RE.fullmatch(line)
+    return (
+        closing is not None
+        and closing.group(1)[0] == fence.marker[0]
+        and len(closing.group(1)) >= len(fence.marker)
+    )
+
+
+def code_block(fence: Fence, lines: typing.List[str]) -> CodeBlock:
+    """Build a code block from its fence and content lines.
+
+    Content lines lose as much indentation as the opening fence had, and
+    the language is the first word of the info string.
+
+    Args:
+        fence: the opening fence
+        lines: content lines, with line endings
+
+    Returns:
+        the code block
+    """
+    if fence.indent:
+        lines = [
+            line[min(fence.indent, len(line) - len(line.lstrip(" "))) :]
+            for line in lines
+        ]
+    lang = fence.info.split(maxsplit=1)[0] if fence.info else None
+    return CodeBlock(lang, "".join(lines))
+
+
+def md_segments(md: str) -> typing.Iterator[Segment]:
+    """Split Markdown into text and fenced code blocks, in one pass.
+
+    Each line is looked at once, so this runs in linear time however many
+    fences there are. A fence left open runs to the end of the document.
+    Fences inside list items and block quotes are not recognized.
+
+    Args:
+        md: Markdown string
+
+    Yields:
+        Markdown text, each followed by the code block after it; the last
+        segment has no code block
+    """
+    start = 0
+    position = 0
+    fence: typing.Optional[Fence] = None
+    fence_start = 0
+    content: typing.List[str] = []
+    for line in md.splitlines(keepends=True):
+        if fence is None:
+            fence = open_fence(line)
+            if fence is not None:
+                fence_start = position
+                content = []
+        elif closes_fence(line, fence):
+            yield Segment(md[start:fence_start], code_block(fence, content))
+            start = position + len(line.rstrip("\r\n"))
+            fence = None
+        else:
+            content.append(line)
+        position += len(line)
+    if fence is not None:
+        yield Segment(md[start:fence_start], code_block(fence, content))
+        start = position
+    yield Segment(md[start:], None)
+
+
+@timed("md_highlight")
 def md_highlight(md: str) -> str:
     """Replace markdown code blocks with pygmented HTML.
 
@@ -56,7 +321,13 @@ def md_highlight(md: str) -> str:
         A string containing Markdown with code fenced blocks
         replaced with highlighted HTML.
     """
-    return CODE_RE.sub(md_codeblock, md)
+    pieces = []
+    for segment in md_segments(md):
+        pieces.append(segment.text)
+        if segment.block is not None:
+            count("highlight_blocks")
+            pieces.append(highlight(*segment.block))
+    return "".join(pieces)
 
 
 def md_highlight_and_parse(md: str) -> str:
@@ -72,6 +343,96 @@ def md_highlight_and_parse(md: str) -> str:
     return md_parse(coded)
 
 
+def md_blocks(md: str, size: int = STREAM_CHUNK_SIZE) -> typing.Iterator[str]:
+    """Split Markdown into independently renderable runs of blocks.
+
+    Splits only happen at a blank line followed by an unindented line that
+    cannot continue the preceding block: never inside a code fence or a
+    raw HTML block, and never before a list item or indented line. Each
+    piece is at least size characters long, except the last. Link
+    reference definitions apply to the whole document, so they are
+    repeated at the start of every piece.
+
+    Args:
+        md: Markdown string
+        size: minimum size of each piece, in characters
+
+    Yields:
+        consecutive pieces of the Markdown string
+    """
+    splits = []
+    link_defs = []
+    start = 0
+    position = 0
+    blank = False
+    fence: typing.Optional[Fence] = None
+    closer: typing.Optional[str] = None
+    for line in md.splitlines(keepends=True):
+        if fence is not None:
+            fence = None if closes_fence(line, fence) else fence
+        elif closer is not None:
+            closer = None if closer in line.lower() else closer
+        else:
+            if (
+                blank
+                and position - start >= size
+                and not line[0].isspace()
+                and not LIST_ITEM_RE.match(line)
+            ):
+                splits.append(position)
+                start = position
+            if LINK_DEF_RE.match(line):
+                link_defs.append(line.rstrip("\r\n"))
+            fence = open_fence(line)
+            closer = None if fence else html_closer(line)
+        blank = not line.strip()
+        position += len(line)
+    if not splits:
+        yield md
+        return
+    prefix = "\n".join((*link_defs, "\n")) if link_defs else ""
+    for start, end in zip([0, *splits], [*splits, len(md)]):
+        yield prefix + md[start:end]
+
+
+def html_closer(line: str) -> typing.Optional[str]:
+    """Find what ends a raw HTML block in which blank lines do not end it.
+
+    Args:
+        line: first line of a block
+
+    Returns:
+        the closing tag that ends the block, if any
+    """
+    raw_html = RAW_HTML_RE.match(line)
+    if raw_html:
+        end_tag = RAW_HTML_END[raw_html.group(1).lower()]
+        if end_tag not in line[raw_html.end() :].lower():
+            return end_tag
+    return None
+
+
+def md_highlight_and_parse_iter(
+    md: str, size: int = STREAM_CHUNK_SIZE
+) -> typing.Iterator[str]:
+    """Code highlight then convert to HTML, a piece at a time.
+
+    For large documents, this avoids holding the whole highlighted Markdown
+    and the whole HTML in memory at once. Joined together, the pieces match
+    the output of md_highlight_and_parse().
+
+    Args:
+        md: Markdown string.
+        size: minimum size of each Markdown piece, in characters
+
+    Yields:
+        HTML converted from consecutive pieces of the Markdown input.
+    """
+    for block in md_blocks(md, size):
+        yield md_parse(md_highlight(block))
+
+
+@timed("md_parse")
 def md_parse(md: str) -> str:
     """Parse Markdown.
 
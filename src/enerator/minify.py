@@ -0,0 +1,354 @@
+"""HTML minification for generated pages.
+
+Whitespace is collapsed outside <pre>, <textarea>, <script> and <style>,
+and dropped next to block-level tags where browsers ignore it. Attribute
+values that need no quotes lose them. Inside highlighted code, the empty
+and whitespace-only <span> elements Pygments emits are unwrapped.
+
+With short classes, Pygments token classes are also renamed so that all
+tokens sharing a style share one short class; tokens without a style are
+unwrapped, and adjacent spans of the same class merged. Pages minified
+this way need the stylesheet from highlight_css(), which builds write to
+highlight.css at the root of the site, instead of the one Pygments
+generates.
+"""
+
+import functools
+import re
+import string
+import typing
+
+import enerator.timing
+from enerator.markdown import FORMATTER
+
+RAW_RE = re.compile(
+    r"<!--.*?-->|<(pre|textarea|script|style)\b[^>]*>.*?</\1\s*>", re.S | re.I
+)
+TAG_RE = re.compile(r"""</?[A-Za-z][^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>""")
+TAG_PARTS_RE = re.compile(
+    r"""<(/?)([A-Za-z][A-Za-z0-9-]*)((?:\s+[^\s=/>"']+"""
+    r"""(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>"']+))?)*)\s*(/?)>"""
+)
+ATTR_RE = re.compile(r"""\s+([^\s=/>"']+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>"']+))?""")
+UNQUOTED_RE = re.compile(r"[^\s\"'=<>`]+")
+SPACE_RE = re.compile(r"\s+")
+SPAN_RE = re.compile(r'<span class="([^"]*)">([^<]*)</span>|<span></span>')
+BLOCK_TAGS = frozenset(
+    (
+        "address article aside blockquote body br dd details div dl dt "
+        "fieldset figcaption figure footer form h1 h2 h3 h4 h5 h6 head header "
+        "hr html li link main meta nav ol p pre section summary table tbody "
+        "td tfoot th thead title tr ul"
+    ).split()
+)
+WHITESPACE_CLASS = "w"
+CSS_FILE = "highlight.css"
+
+enabled = False
+short_classes = False
+
+
+class Piece(typing.NamedTuple):
+    """A run of text, a tag or a raw element of an HTML document."""
+
+    text: str
+    tag: typing.Optional[str]
+    raw: bool
+
+
+def configure(enable: bool = True, shorten: bool = False) -> None:
+    """Turn minification of generated pages on or off.
+
+    Args:
+        enable: minify pages
+        shorten: also rename Pygments classes; see highlight_css()
+    """
+    global enabled, short_classes  # noqa:WPS420
+    enabled = enable  # noqa:WPS442
+    short_classes = enable and shorten  # noqa:WPS442
+
+
+def short_name(index: int) -> str:
+    """Name the nth short class: a, b, ... z, ba, bb, ...
+
+    Args:
+        index: position of the class
+
+    Returns:
+        class name
+    """
+    letters = string.ascii_lowercase
+    name = letters[index % len(letters)]
+    index //= len(letters)
+    while index:
+        name = letters[index % len(letters)] + name
+        index //= len(letters)
+    return name
+
+
+@functools.lru_cache(maxsize=1)
+def class_map() -> typing.Dict[str, str]:
+    """Map Pygments token classes to short classes, one per distinct style.
+
+    Returns:
+        short class for each token class that has a style
+    """
+    styles: typing.Dict[str, str] = {}
+    classes = {}
+    for token_class, (style, _, _) in FORMATTER.class2style.items():
+        if token_class == WHITESPACE_CLASS or not style:
+            continue
+        if style not in styles:
+            styles[style] = short_name(len(styles))
+        classes[token_class] = styles[style]
+    return classes
+
+
+def highlight_css(prefix: str = ".highlight") -> str:
+    """Build the stylesheet for code minified with short classes.
+
+    Args:
+        prefix: selector of the element wrapping highlighted code
+
+    Returns:
+        CSS text
+    """
+    styles = {}
+    for token_class, short in class_map().items():
+        styles[short] = FORMATTER.class2style[token_class][0]
+    lines = [
+        *FORMATTER.get_linenos_style_defs(),
+        *FORMATTER.get_background_style_defs(prefix),
+        *(f"{prefix} .{short} {{ {style} }}" for short, style in styles.items()),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def split_html(html: str) -> typing.List[Piece]:
+    """Split a document into text, tags and raw elements.
+
+    Args:
+        html: HTML document
+
+    Returns:
+        pieces in document order
+    """
+    pieces: typing.List[Piece] = []
+    position = 0
+    for raw in RAW_RE.finditer(html):
+        pieces.extend(split_tags(html[position : raw.start()]))
+        pieces.append(Piece(raw.group(), (raw.group(1) or "").lower(), True))
+        position = raw.end()
+    pieces.extend(split_tags(html[position:]))
+    return pieces
+
+
+def split_tags(html: str) -> typing.Iterator[Piece]:
+    """Split HTML without raw elements into text and tags.
+
+    Args:
+        html: HTML fragment
+
+    Yields:
+        pieces in document order
+    """
+    position = 0
+    for tag in TAG_RE.finditer(html):
+        if tag.start() > position:
+            yield Piece(html[position : tag.start()], None, False)
+        parts = TAG_PARTS_RE.fullmatch(tag.group())
+        name = parts.group(2).lower() if parts else ""
+        yield Piece(clean_tag(tag.group()), name, False)
+        position = tag.end()
+    if position < len(html):
+        yield Piece(html[position:], None, False)
+
+
+def clean_tag(tag: str) -> str:
+    """Drop redundant whitespace and attribute quotes from a tag.
+
+    Tags that do not parse cleanly are left alone.
+
+    Args:
+        tag: a start or end tag
+
+    Returns:
+        the equivalent, shorter tag
+    """
+    parts = TAG_PARTS_RE.fullmatch(tag)
+    if not parts:
+        return tag
+    closing, name, attrs, self_closing = parts.groups()
+    output = [f"<{closing}{name}"]
+    bare = False
+    for attr in ATTR_RE.finditer(attrs):
+        attr_name, attr_value = attr.groups()
+        bare = False
+        if attr_value is None:
+            output.append(f" {attr_name}")
+            continue
+        inner = attr_value[1:-1] if attr_value[:1] in {'"', "'"} else attr_value
+        if not inner:
+            output.append(f" {attr_name}")
+        elif UNQUOTED_RE.fullmatch(inner) and not inner.endswith("/"):
+            output.append(f" {attr_name}={inner}")
+            bare = True
+        else:
+            output.append(f" {attr_name}={attr_value}")
+    if self_closing:
+        output.append(" /" if bare else "/")
+    output.append(">")
+    return "".join(output)
+
+
+def collapse(text: str) -> str:
+    """Collapse a run of whitespace to a single character.
+
+    A newline is kept where the run had one, so output stays diffable.
+
+    Args:
+        text: whitespace
+
+    Returns:
+        a newline or a space
+    """
+    return "\n" if "\n" in text else " "
+
+
+def minify_text(text: str, block_before: bool, block_after: bool) -> str:
+    """Collapse whitespace in text between tags.
+
+    Args:
+        text: text outside tags
+        block_before: whether the preceding tag is block-level
+        block_after: whether the following tag is block-level
+
+    Returns:
+        minified text
+    """
+    text = SPACE_RE.sub(lambda space: collapse(space.group()), text)
+    if block_before:
+        text = text.lstrip()
+    if block_after:
+        text = text.rstrip()
+    return text
+
+
+def minify_code(html: str, shorten: bool) -> str:
+    """Remove redundant spans from highlighted code.
+
+    Whitespace and empty spans are unwrapped, and adjacent spans of the same
+    class are merged.
+
+    Args:
+        html: contents of a <pre> element
+        shorten: rename classes and unwrap tokens that have no style
+
+    Returns:
+        equivalent markup
+    """
+    classes = class_map() if shorten else {}
+    output: typing.List[str] = []
+    last_class = None
+    position = 0
+    for span in SPAN_RE.finditer(html):
+        if span.start() > position:
+            output.append(html[position : span.start()])
+            last_class = None
+        position = span.end()
+        token_class, text = span.groups()
+        if token_class is None:
+            continue
+        if shorten:
+            token_class = classes.get(token_class, WHITESPACE_CLASS)
+        if token_class == WHITESPACE_CLASS:
+            output.append(text)
+            last_class = None
+        elif not UNQUOTED_RE.fullmatch(token_class):
+            output.append(span.group())
+            last_class = None
+        elif token_class == last_class:
+            output[-1] = f"{output[-1][: -len('</span>')]}{text}</span>"
+        else:
+            last_class = token_class
+            output.append(f"<span class={token_class}>{text}</span>")
+    output.append(html[position:])
+    return "".join(output)
+
+
+def minify_raw(piece: Piece, shorten: bool) -> str:
+    """Minify a raw element, leaving its content as it is.
+
+    Only highlighted code inside <pre> is touched.
+
+    Args:
+        piece: raw element
+        shorten: shorten Pygments classes
+
+    Returns:
+        minified element
+    """
+    if piece.tag != "pre":
+        return piece.text
+    start = piece.text.index(">") + 1
+    end = piece.text.rindex("</")
+    return "".join(
+        (
+            clean_tag(piece.text[:start]),
+            minify_code(piece.text[start:end], shorten),
+            piece.text[end:],
+        )
+    )
+
+
+@enerator.timing.timed("minify")
+def minify(html: str, shorten: typing.Optional[bool] = None) -> str:
+    """Minify an HTML document.
+
+    Args:
+        html: HTML document
+        shorten: shorten Pygments classes; defaults to the configured setting
+
+    Returns:
+        the equivalent, smaller document
+    """
+    if shorten is None:
+        shorten = short_classes
+    pieces = split_html(html)
+    output = []
+    for index, piece in enumerate(pieces):
+        if piece.raw:
+            output.append(minify_raw(piece, shorten))
+        elif piece.tag is not None:
+            output.append(piece.text)
+        else:
+            before = pieces[index - 1].tag if index else None
+            after = pieces[index + 1].tag if index + 1 < len(pieces) else None
+            output.append(
+                minify_text(piece.text, before in BLOCK_TAGS, after in BLOCK_TAGS)
+            )
+    return "".join(output)
+
+
+def report(sizes: typing.Iterable[typing.Sequence[int]]) -> str:
+    """Summarize the bytes saved by minification.
+
+    Args:
+        sizes: original and minified size of each page
+
+    Returns:
+        one line of text
+    """
+    pages = 0
+    before = 0
+    after = 0
+    for original, minified in sizes:
+        pages += 1
+        before += original
+        after += minified
+    saved = before - after
+    percent = saved / before * 100 if before else 0
+    return (
+        f"Minified {pages} pages: {before} -> {after} bytes "
+        f"({saved} bytes, {percent:.1f}% saved)"
+    )
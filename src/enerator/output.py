@@ -0,0 +1,416 @@
+"""Writing generated pages to the output directory.
+
+Files are written through a temporary file and renamed into place, and
+files whose content is unchanged are left alone so their modification
+times stay stable. An OutputWriter buffers small pages and writes them on
+a bounded pool of I/O threads while rendering continues, and can stage a
+whole build in a separate directory that replaces the output at the end.
+
+The writer can also keep precompressed copies (index.html.gz and, when
+the brotli package is installed, index.html.br) next to each file for
+servers configured with gzip_static or brotli_static.
+"""
+
+import contextlib
+import functools
+import hashlib
+import itertools
+import os
+import pathlib
+import shutil
+import threading
+import typing
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from enerator.cache import digest, file_digest
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
+
+WRITE_WORKERS = 4
+BUFFER_SIZE = 1024 * 1024
+READ_SIZE = 65536
+GZIP_WBITS = 31
+SIBLING_SUFFIXES = (".gz", ".br")
+
+
+class Compressor(typing.NamedTuple):
+    """Streaming compression for one content encoding."""
+
+    suffix: str
+    factory: typing.Callable[[], typing.Any]
+    finish: str
+
+
+COMPRESSORS = {
+    "gzip": Compressor(
+        ".gz",
+        lambda: zlib.compressobj(zlib.Z_BEST_COMPRESSION, zlib.DEFLATED, GZIP_WBITS),
+        "flush",
+    ),
+}
+if brotli is not None:  # pragma: no cover
+    COMPRESSORS["br"] = Compressor(".br", brotli.Compressor, "finish")
+
+
+def compressed_chunks(path: pathlib.Path, encoding: str) -> typing.Iterator[bytes]:
+    """Compress a file, piece by piece.
+
+    The output is deterministic (gzip headers carry no timestamp), so an
+    unchanged file compresses to an unchanged sibling.
+
+    Args:
+        path: file to compress
+        encoding: key of COMPRESSORS
+
+    Yields:
+        compressed bytes
+    """
+    compressor = COMPRESSORS[encoding]
+    stream = compressor.factory()
+    compress = getattr(stream, "compress", None) or stream.process
+    with path.open("rb") as fp:
+        for block in iter(functools.partial(fp.read, READ_SIZE), b""):
+            yield compress(block)
+    yield getattr(stream, compressor.finish)()
+
+
+def write_compressed(
+    path: pathlib.Path, encodings: typing.Iterable[str], changed: bool = True
+) -> None:
+    """Write precompressed siblings of a file, such as index.html.gz.
+
+    When the file changed, siblings left by earlier builds in encodings no
+    longer enabled are removed, so a server never prefers a stale copy.
+
+    Args:
+        path: file to compress
+        encodings: keys of COMPRESSORS
+        changed: whether the file changed; if not, only missing siblings
+            are written
+    """
+    suffixes = set()
+    for encoding in encodings:
+        suffixes.add(COMPRESSORS[encoding].suffix)
+        sibling = path.with_name(f"{path.name}{COMPRESSORS[encoding].suffix}")
+        if changed or not sibling.exists():
+            write_chunks_if_changed(sibling, compressed_chunks(path, encoding))
+    if changed:
+        for suffix in set(SIBLING_SUFFIXES) - suffixes:
+            with contextlib.suppress(FileNotFoundError):
+                path.with_name(f"{path.name}{suffix}").unlink()
+
+
+def write_chunks_if_changed(
+    path: pathlib.Path, chunks: typing.Iterable[bytes]
+) -> typing.Tuple[bool, str]:
+    """Stream content to a file unless it already has exactly this content.
+
+    Content is written to a temporary file while being hashed, then moved
+    into place only if it differs from the existing file. Leaving identical
+    files alone keeps their modification times stable.
+
+    Args:
+        path: file to write
+        chunks: bytes to write, piece by piece
+
+    Returns:
+        whether the file was written, and the hex digest of the content
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    hasher = hashlib.sha256()
+    try:
+        with tmp_path.open("wb") as fp:
+            for chunk in chunks:
+                hasher.update(chunk)
+                fp.write(chunk)
+        content_digest = hasher.hexdigest()
+        with contextlib.suppress(FileNotFoundError):
+            if (
+                path.stat().st_size == tmp_path.stat().st_size
+                and file_digest(path) == content_digest
+            ):
+                return (False, content_digest)
+        os.replace(tmp_path, path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            tmp_path.unlink()
+    return (True, content_digest)
+
+
+def write_if_changed(
+    path: pathlib.Path, content: bytes, content_digest: typing.Optional[str] = None
+) -> bool:
+    """Write file unless it already has exactly this content.
+
+    The existing file is only hashed when its size matches, and nothing is
+    written to disk at all when the content is unchanged.
+
+    Args:
+        path: file to write
+        content: bytes to write
+        content_digest: hex digest of content, if already known
+
+    Returns:
+        True if the file was written
+    """
+    with contextlib.suppress(FileNotFoundError):
+        if path.stat().st_size == len(content) and file_digest(path) == (
+            content_digest or digest(content)
+        ):
+            return False
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            tmp_path.unlink()
+    return True
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Hard link a file, copying it where links are not possible.
+
+    Args:
+        src: existing file
+        dst: new path
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class OutputWriter(object):
+    """Write pages below an output directory, optionally staged."""
+
+    def __init__(
+        self,
+        out: pathlib.Path,
+        workers: int = WRITE_WORKERS,
+        staged: bool = False,
+        encodings: typing.Iterable[str] = (),
+    ) -> None:
+        """Prepare the output directory.
+
+        With staging, the current output is hard linked into a new directory
+        which receives all writes; the existing site is untouched until
+        commit() swaps the new directory in.
+
+        Args:
+            out: output directory for static site
+            workers: number of I/O threads; 0 writes synchronously
+            staged: build into a separate directory and swap it in at the end
+            encodings: keys of COMPRESSORS for precompressed copies; encodings
+                that are not available are ignored
+        """
+        self.root = out.resolve()
+        self.staged = staged
+        self.encodings = tuple(name for name in encodings if name in COMPRESSORS)
+        self.target = self.root
+        if staged:
+            self.target = self.root.with_name(f".{self.root.name}.{os.getpid()}.new")
+            shutil.rmtree(self.target, ignore_errors=True)
+            if self.root.is_dir():
+                shutil.copytree(
+                    self.root, self.target, symlinks=True, copy_function=link_or_copy
+                )
+        self.target.mkdir(parents=True, exist_ok=True)
+        self.written = 0
+        self.skipped = 0
+        self.dirs: typing.Set[pathlib.Path] = set()
+        self.lock = threading.Lock()
+        self.futures: typing.List[Future] = []
+        self.executor: typing.Optional[ThreadPoolExecutor] = None
+        self.slots: typing.Optional[threading.BoundedSemaphore] = None
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+            self.slots = threading.BoundedSemaphore(workers * 4)
+
+    def __getstate__(self) -> dict:
+        """Pickle the writer for a worker process, which writes synchronously.
+
+        Returns:
+            picklable attributes
+        """
+        state = self.__dict__.copy()
+        state.update(
+            dirs=set(),
+            lock=None,
+            futures=[],
+            executor=None,
+            slots=None,
+            written=0,
+            skipped=0,
+        )
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore a pickled writer.
+
+        Args:
+            state: attributes from __getstate__()
+        """
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def __enter__(self) -> "OutputWriter":
+        """Use as a context manager that commits on success.
+
+        Returns:
+            the writer
+        """
+        return self
+
+    def __exit__(self, exc_type: typing.Any, *exc_info: typing.Any) -> None:
+        """Commit the build, or discard staged output after an error.
+
+        Args:
+            exc_type: exception type, if the block raised
+            exc_info: exception value and traceback
+        """
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def write(
+        self, relpath: str, chunks: typing.Iterable[bytes]
+    ) -> typing.Tuple[pathlib.Path, str]:
+        """Write a file below the output directory.
+
+        Content up to BUFFER_SIZE is buffered and handed to the I/O threads,
+        so the caller can carry on rendering. Larger content is streamed
+        straight to disk. Precompressed siblings are rewritten only when the
+        file changed, and then any in encodings not enabled are removed.
+
+        Args:
+            relpath: path relative to the output directory
+            chunks: bytes to write, piece by piece
+
+        Returns:
+            final path of the file and the hex digest of its content
+        """
+        path = self.target / relpath
+        if path.parent not in self.dirs:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.dirs.add(path.parent)
+        iterator = iter(chunks)
+        buffered = []
+        size = 0
+        for chunk in iterator:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size > BUFFER_SIZE:
+                written, content_digest = write_chunks_if_changed(
+                    path, itertools.chain(buffered, iterator)
+                )
+                self.count(written)
+                if written or self.encodings:
+                    self.submit(write_compressed, path, self.encodings, written)
+                return (self.root / relpath, content_digest)
+        content = b"".join(buffered)
+        content_digest = digest(content)
+        self.submit(self.store, path, content, content_digest)
+        return (self.root / relpath, content_digest)
+
+    def keep(self, path: pathlib.Path) -> None:
+        """Note that a file from an earlier build is still wanted as is.
+
+        Any precompressed siblings it is missing are written.
+
+        Args:
+            path: final path of the file, as returned by write()
+        """
+        if self.encodings:
+            target = self.target / path.relative_to(self.root)
+            self.submit(write_compressed, target, self.encodings, False)
+
+    def store(self, path: pathlib.Path, content: bytes, content_digest: str) -> None:
+        """Write buffered content and its precompressed siblings.
+
+        Args:
+            path: file to write
+            content: bytes to write
+            content_digest: hex digest of content
+        """
+        written = write_if_changed(path, content, content_digest)
+        self.count(written)
+        write_compressed(path, self.encodings, written)
+
+    def submit(self, func: typing.Callable, *args: typing.Any) -> None:
+        """Run a write on the I/O threads, or now when writing synchronously.
+
+        At most a few writes per thread are queued at once, which bounds the
+        memory held by buffered pages.
+
+        Args:
+            func: write function
+            args: positional arguments
+        """
+        if self.executor is None or self.slots is None:
+            func(*args)
+            return
+        self.slots.acquire()
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(self.done)
+        self.futures.append(future)
+
+    def done(self, future: Future) -> None:
+        """Free the queue slot of a finished background write.
+
+        Args:
+            future: the write
+        """
+        self.slots.release()  # type: ignore
+
+    def count(self, written: bool) -> None:
+        """Tally a write.
+
+        Args:
+            written: whether the file was written or skipped as unchanged
+        """
+        with self.lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+
+    def flush(self) -> None:
+        """Wait for pending writes, raising the first error."""
+        futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def commit(self) -> None:
+        """Finish writing and, when staged, swap the new output into place."""
+        try:
+            self.flush()
+        except BaseException:
+            self.abort()
+            raise
+        self.close()
+        if self.staged:
+            old = self.root.with_name(f".{self.root.name}.{os.getpid()}.old")
+            if self.root.exists():
+                os.replace(self.root, old)
+            os.replace(self.target, self.root)
+            shutil.rmtree(old, ignore_errors=True)
+
+    def abort(self) -> None:
+        """Stop writing and discard any staged output."""
+        for future in self.futures:
+            future.cancel()
+        self.close()
+        if self.staged:
+            shutil.rmtree(self.target, ignore_errors=True)
+
+    def close(self) -> None:
+        """Release the I/O threads."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -1,19 +1,77 @@
 """Preview generated site in browser."""
 
 import asyncio
+import collections
+import email.utils
+import functools
+import json
 import mimetypes
 import pathlib
+import stat as stat_module
 import typing
+import urllib.parse
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 
 import uvicorn  # type: ignore
 
+import enerator.deps
 from enerator.add import module_to_path
-from enerator.generate import generate_page, load_module, routes
-
-CHUNK_SIZE = 1024
-MEG = 1048576
+from enerator.cache import digest
+from enerator.generate import (
+    PageContext,
+    load_module,
+    page_context,
+    render_iter,
+    routes,
+)
+from enerator.manifest import module_source
+from enerator.watch import Watcher, shared_watcher
+
+CHUNK_SIZE = 65536
+SSE_PADDING = 2048
+SSE_RETRY = 1000
+HEARTBEAT_INTERVAL = 15
 PORT = 8080
 STATIC_DIR = "/assets"
+RENDER_POOLS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+RENDER_WORKERS = 4
+PAGE_CACHE_SIZE = 128
+
+render_pool: typing.Optional[Executor] = None
+rendering: typing.Dict[str, "PageRender"] = {}
+render_generation = 0
+refreshed_generation: typing.Optional[int] = None
+
+
+class CachedPage(typing.NamedTuple):
+    """Rendered page with the source state it was rendered from."""
+
+    stamp: tuple
+    watchlist: tuple
+    body: bytes
+    etag: str
+
+
+page_cache: "collections.OrderedDict[str, CachedPage]" = collections.OrderedDict()
+
+
+class Stream(typing.NamedTuple):
+    """An open event stream and the files it watches for each page."""
+
+    watcher: Watcher
+    watched: typing.Dict[str, typing.FrozenSet[pathlib.Path]]
+
+
+streams: typing.Dict[asyncio.Queue, Stream] = {}
+
+
+class FileSpan(typing.NamedTuple):
+    """Part of a file that a server extension can send directly."""
+
+    path: pathlib.Path
+    offset: int
+    length: int
+    whole: bool
 
 
 class Response(typing.NamedTuple):
@@ -22,6 +80,23 @@ class Response(typing.NamedTuple):
     body_gen: typing.AsyncGenerator
     status: int
     headers: list = [(b"content-type", b"text/html")]
+    file_span: typing.Optional[FileSpan] = None
+
+
+def request_header(scope: dict, name: bytes) -> typing.Optional[bytes]:
+    """Look up a request header.
+
+    Args:
+        scope: ASGI scope dict
+        name: lowercase header name
+
+    Returns:
+        header value, if present
+    """
+    for key, header_value in scope.get("headers", []):
+        if key == name:
+            return header_value
+    return None
 
 
 async def not_found(scope: dict) -> Response:
@@ -41,72 +116,632 @@ async def not_found(scope: dict) -> Response:
     return Response(body_gen(), status)
 
 
+@functools.lru_cache(maxsize=None)
+def content_type(suffix: str) -> bytes:
+    """Guess content type from a file extension.
+
+    Args:
+        suffix: file extension, including the dot
+
+    Returns:
+        content type header value
+    """
+    return (mimetypes.guess_type(f"file{suffix}")[0] or "text/plain").encode()
+
+
+@functools.lru_cache(maxsize=1024)
+def validators(mtime_ns: int, size: int) -> typing.Tuple[bytes, bytes]:
+    """Build cache validators for a file.
+
+    Args:
+        mtime_ns: modification time in nanoseconds
+        size: file size
+
+    Returns:
+        ETag and Last-Modified header values
+    """
+    etag = f'"{mtime_ns:x}-{size:x}"'.encode()
+    last_modified = email.utils.formatdate(mtime_ns / 1e9, usegmt=True).encode()
+    return (etag, last_modified)
+
+
+def not_modified(scope: dict, etag: bytes, mtime_ns: int) -> bool:
+    """Evaluate conditional request headers.
+
+    Args:
+        scope: ASGI scope dict
+        etag: current ETag of the resource
+        mtime_ns: modification time in nanoseconds
+
+    Returns:
+        True if the client's copy is current
+    """
+    if_none_match = request_header(scope, b"if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(b",")}
+        return etag in tags or b"*" in tags
+    if_modified_since = request_header(scope, b"if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since.decode())
+    except (TypeError, ValueError):
+        return False
+    return mtime_ns // 1_000_000_000 <= since.timestamp()
+
+
+def byte_range(
+    scope: dict, etag: bytes, size: int
+) -> typing.Optional[typing.Tuple[int, int]]:
+    """Parse a single-range Range header.
+
+    Multiple ranges, and ranges made stale by If-Range, are ignored so the
+    whole file is sent.
+
+    Args:
+        scope: ASGI scope dict
+        etag: current ETag of the resource
+        size: file size
+
+    Returns:
+        first and last byte positions, None for the whole file
+
+    Raises:
+        ValueError: if the range cannot be satisfied
+    """
+    range_header = request_header(scope, b"range")
+    if_range = request_header(scope, b"if-range")
+    if range_header is None or (if_range is not None and if_range != etag):
+        return None
+    unit, _, spec = range_header.decode().partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError(range_header)
+    return (start, end)
+
+
+async def file_body_gen(
+    path: pathlib.Path, offset: int, count: int
+) -> typing.AsyncGenerator[bytes, None]:
+    """Asynchronously yield part of a file without blocking the loop.
+
+    Args:
+        path: file path
+        offset: first byte to send
+        count: number of bytes to send
+
+    Yields:
+        chunks of the file, in bytes
+    """
+    loop = asyncio.get_running_loop()
+    fp = await loop.run_in_executor(None, path.open, "rb")
+    try:
+        fp.seek(offset)
+        while count > 0:
+            chunk = await loop.run_in_executor(None, fp.read, min(CHUNK_SIZE, count))
+            if not chunk:
+                break
+            count -= len(chunk)
+            yield chunk
+    finally:
+        fp.close()
+
+
 async def static_body(scope: dict) -> Response:
     """Check if static file and return blob if so.
 
+    Responses carry validators and honor conditional and single-range
+    requests. The file itself is sent with the server's pathsend or
+    zerocopy extension when available.
+
     Args:
         scope: ASGI scope dict
 
     Returns:
         response
-    """  # noqa:DAR301
-    source_path = pathlib.Path(scope["path"][1:])
-    if source_path.exists():
-        status = 200
-
-        async def body_gen() -> typing.AsyncGenerator[bytes, None]:
-            with source_path.open("rb") as fp:
-                for chunk in iter(fp.read, b""):
-                    yield chunk
-
-        response = Response(
-            body_gen(),
-            status,
-            [
-                (
-                    b"content-type",
-                    (
-                        mimetypes.guess_type(str(source_path))[0] or "text/plain"
-                    ).encode(),
-                )
-            ],
-        )
+    """
+    static_root = pathlib.Path(STATIC_DIR[1:]).resolve()
+    source_path = pathlib.Path(scope["path"][1:]).resolve()
+    try:
+        stat = source_path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        stat = None
+    if (
+        stat is None
+        or not stat_module.S_ISREG(stat.st_mode)
+        or static_root not in source_path.parents
+    ):
+        return await not_found(scope)
+    size = stat.st_size
+    etag, last_modified = validators(stat.st_mtime_ns, size)
+    headers = [
+        (b"content-type", content_type(source_path.suffix.lower())),
+        (b"etag", etag),
+        (b"last-modified", last_modified),
+        (b"accept-ranges", b"bytes"),
+        (b"cache-control", b"no-cache"),
+    ]
+    if not_modified(scope, etag, stat.st_mtime_ns):
+        return Response(page_body_gen(b""), 304, headers)
+    try:
+        requested = byte_range(scope, etag, size)
+    except ValueError:
+        headers.append((b"content-range", f"bytes */{size}".encode()))
+        return Response(page_body_gen(b""), 416, headers)
+    status = 200
+    start, end = requested or (0, size - 1)
+    count = end - start + 1
+    if requested:
+        status = 206
+        headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+    headers.append((b"content-length", str(count).encode()))
+    return Response(
+        file_body_gen(source_path, start, count),
+        status,
+        headers,
+        FileSpan(source_path, start, count, requested is None),
+    )
+
+
+def set_render_pool(kind: str = "thread", workers: int = RENDER_WORKERS) -> Executor:
+    """Choose the worker pool that renders pages off the event loop.
+
+    Args:
+        kind: "thread" or "process"
+        workers: number of workers
+
+    Returns:
+        the new executor
+    """
+    global render_pool  # noqa:WPS420
+    old_pool = render_pool
+    render_pool = RENDER_POOLS[kind](max_workers=workers)  # noqa:WPS442
+    if old_pool is not None:
+        old_pool.shutdown(wait=False)
+    return render_pool
+
+
+def page_watchlist(context: PageContext, found: typing.Set[str]) -> list:
+    """List the files a rendered page depends on.
+
+    Args:
+        context: the page's context
+        found: file paths recorded while loading and rendering the page
+
+    Returns:
+        the page's watch list, then the absolute paths of recorded files
+    """
+    watchlist = list(context.config.get("watch", []))
+    root = pathlib.Path.cwd()
+    deps = enerator.deps.page_deps(context.module, found)
+    return [*watchlist, *(str(root / path) for path in deps)]
+
+
+def load_page(
+    module: str, found: typing.Set[str], generation: typing.Optional[int] = None
+) -> PageContext:
+    """Load a page for a live reload render.
+
+    Project modules changed since they were loaded are imported afresh,
+    once per generation in each process; the event loop starts a new
+    generation whenever it finds a page that needs rendering. Modules are
+    unloaded and loaded under a lock shared by the render threads, so no
+    render sees a half refreshed set of modules.
+
+    Args:
+        module: module string
+        found: set to add the files read while loading to
+        generation: generation of the render, or None to always refresh
+
+    Returns:
+        the page's context
+    """
+    global refreshed_generation  # noqa:WPS420
+    with enerator.deps.module_lock:
+        if generation is None or generation != refreshed_generation:
+            enerator.deps.refresh_modules()
+            refreshed_generation = generation  # noqa:WPS442
+        with enerator.deps.recording(found):
+            context = page_context(module, devmode=True)
+        enerator.deps.record_modules()
+    return context
+
+
+def render_page(
+    module: str, generation: typing.Optional[int] = None
+) -> typing.Tuple[str, list]:
+    """Render page with live reload, for use in a worker process.
+
+    Args:
+        module: module string
+        generation: generation of the render, as for load_page()
+
+    Returns:
+        generated page text and the files it depends on
+    """
+    rel = {"devmode": True}
+    found: typing.Set[str] = set()
+    context = load_page(module, found, generation)
+    with enerator.deps.recording(found):
+        body = "".join(render_iter(context, rel))
+    return (body, page_watchlist(context, found))
+
+
+def stream_page(
+    module: str,
+    emit: typing.Callable[[str], object],
+    generation: typing.Optional[int] = None,
+) -> list:
+    """Render page with live reload, for use in a worker thread.
+
+    Args:
+        module: module string
+        emit: called with each piece of the page as it is generated
+        generation: generation of the render, as for load_page()
+
+    Returns:
+        the files the page depends on
+    """
+    rel = {"devmode": True}
+    found: typing.Set[str] = set()
+    context = load_page(module, found, generation)
+    for chunk in enerator.deps.recorded_iter(render_iter(context, rel), found):
+        emit(chunk)
+    return page_watchlist(context, found)
+
+
+class PageRender(object):
+    """A page being rendered, shared by every request that wants it."""
+
+    def __init__(self, module: str, loop: asyncio.AbstractEventLoop) -> None:
+        """Start with no output.
+
+        Args:
+            module: module string
+            loop: event loop of the requests
+        """
+        self.module = module
+        self.loop = loop
+        self.chunks: typing.List[bytes] = []
+        self.watchlist: list = []
+        self.error: typing.Optional[Exception] = None
+        self.done = False
+        self.updated: asyncio.Future = loop.create_future()
+
+    def append(self, text: str) -> None:
+        """Add a piece of the page.
+
+        Args:
+            text: generated page text
+        """
+        self.chunks.append(with_reload_script(text, self.module).encode())
+        self.notify()
+
+    def finish(self, watchlist: list, error: typing.Optional[Exception] = None) -> None:
+        """Mark the render complete.
+
+        Args:
+            watchlist: the page's watch list
+            error: exception raised by the render, if it failed
+        """
+        self.watchlist = watchlist
+        self.error = error
+        self.done = True
+        self.notify()
+
+    def notify(self) -> None:
+        """Wake up requests waiting for more of the page."""
+        updated = self.updated
+        self.updated = self.loop.create_future()
+        updated.set_result(None)
+
+    async def started(self) -> None:
+        """Wait until there is output, so that render errors surface early.
+
+        Raises:
+            Exception: whatever the render raised
+        """
+        while not self.chunks and not self.done:
+            await asyncio.shield(self.updated)
+        if self.error is not None:
+            raise self.error
+
+    async def follow(self) -> typing.AsyncGenerator[bytes, None]:
+        """Asynchronously yield the page as it is rendered.
+
+        Yields:
+            pieces of the page, in bytes
+
+        Raises:
+            Exception: whatever the render raised
+        """
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.error is not None:
+                raise self.error
+            if self.done:
+                break
+            await asyncio.shield(self.updated)
+
+
+def page_render(module: str, stamp: tuple) -> PageRender:
+    """Render page in the worker pool, or join a render in progress.
+
+    With a thread pool, pieces of the page are passed back as soon as they
+    are generated. A finished render is added to the page cache.
+
+    Args:
+        module: module string
+        stamp: freshness stamp taken before rendering
+
+    Returns:
+        the shared render
+    """
+    loop = asyncio.get_running_loop()
+    pending = rendering.get(module)
+    if pending is None or pending.loop is not loop:
+        pending = PageRender(module, loop)
+        rendering[module] = pending
+        loop.create_task(run_render(pending, stamp))
+    return pending
+
+
+async def run_render(pending: PageRender, stamp: tuple) -> None:
+    """Render page into a shared render and cache the result.
+
+    When the render finds files the stamp did not cover, such as on a
+    page's first render, the stamp is retaken to include them.
+
+    Args:
+        pending: the shared render
+        stamp: freshness stamp taken before rendering
+    """
+    module = pending.module
+    loop = pending.loop
+    pool = render_pool or set_render_pool()
+    previous = page_cache.get(module)
+    stamped = previous.watchlist if previous else ()
+
+    def emit(text: str) -> None:
+        loop.call_soon_threadsafe(pending.append, text)
+
+    try:
+        if isinstance(pool, ThreadPoolExecutor):
+            watchlist = await loop.run_in_executor(
+                pool, stream_page, module, emit, render_generation
+            )
+        else:
+            text, watchlist = await loop.run_in_executor(
+                pool, render_page, module, render_generation
+            )
+            pending.append(text)
+    except Exception as error:
+        pending.finish([], error)
     else:
-        response = await not_found(scope)
-    return response
+        pending.finish(watchlist)
+        body = b"".join(pending.chunks)
+        if tuple(watchlist) != stamped:
+            stamp = freshness(module, watchlist)
+        store_page(
+            module,
+            CachedPage(stamp, tuple(watchlist), body, page_etag(body)),
+        )
+    finally:
+        if rendering.get(module) is pending:
+            del rendering[module]  # noqa:WPS420
 
 
-async def page_body_gen(module: str) -> typing.AsyncGenerator[bytes, None]:
-    """Asynchronously yield page body.
+def page_etag(body: bytes) -> str:
+    """Make the entity tag of a rendered page.
+
+    Args:
+        body: generated page, in bytes
+
+    Returns:
+        quoted entity tag
+    """
+    return f'"{digest(body)[:32]}"'
+
+
+def freshness(module: str, watchlist: typing.Iterable[str]) -> tuple:
+    """Stamp the current state of a page's sources.
 
     Args:
         module: module string
+        watchlist: paths relative to the module directory, as in CONFIG["watch"]
 
-    Yields:
-        Body of generated page, in bytes
+    Returns:
+        tuple of modification time and size for each source file
     """
-    body = generate_page(module, {"devmode": True}).replace(
+    modpath = module_to_path(module)
+    paths = [module_source(module), *(modpath.joinpath(path) for path in watchlist)]
+    stamps: typing.List[typing.Optional[typing.Tuple[int, int]]] = []
+    for path in paths:
+        try:
+            stat = path.stat()  # type: ignore
+        except (AttributeError, FileNotFoundError):
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+RELOAD_WORKER = """\
+const ports = new Map();
+let source = null;
+let current = "";
+let timer = null;
+
+function connect() {
+  timer = null;
+  const modules = [...new Set(ports.values())].sort();
+  const query = modules.map((m) => "module=" + encodeURIComponent(m)).join("&");
+  if (query === current) {
+    return;
+  }
+  current = query;
+  if (source) {
+    source.close();
+    source = null;
+  }
+  if (query) {
+    source = new EventSource("/sse?" + query);
+    source.onmessage = (e) => {
+      for (const [port, module] of ports) {
+        if (module === e.data) {
+          port.postMessage(e.data);
+        }
+      }
+    };
+  }
+}
+
+onconnect = (e) => {
+  const port = e.ports[0];
+  port.onmessage = (m) => {
+    if (m.data === null) {
+      ports.delete(port);
+    } else {
+      ports.set(port, m.data);
+    }
+    timer = timer || setTimeout(connect, 50);
+  };
+};
+"""
+
+
+def with_reload_script(body: str, module: str) -> str:
+    """Inject the live reload script into a page.
+
+    Every tab shares one event stream through a shared worker, which
+    subscribes to the modules of all open pages. Browsers without shared
+    workers open a stream for the page alone.
+
+    Args:
+        body: generated page text
+        module: module string
+
+    Returns:
+        page text that reloads itself when its sources change
+    """
+    return body.replace(
         "</html>",
         "\n".join(
             (
                 "<script>",
-                f"  let eventSource = new EventSource('/sse/{module}');",
-                "  eventSource.addEventListener('message', (e) => {",
-                "    if (e.data === 'modified') {",
-                "      window.location.reload();",
+                "  (() => {",
+                f"    const module = {json.dumps(module)};",
+                "    const reload = (e) => {",
+                "      if (e.data === module) {",
+                "        window.location.reload();",
+                "      }",
+                "    };",
+                "    if (window.SharedWorker) {",
+                "      const port = new SharedWorker('/reload.js').port;",
+                "      port.onmessage = reload;",
+                "      port.postMessage(module);",
+                "      addEventListener('pagehide', () => port.postMessage(null));",
+                "    } else {",
+                "      const query = 'module=' + encodeURIComponent(module);",
+                "      new EventSource('/sse?' + query).onmessage = reload;",
                 "    }",
-                "  });",
+                "  })();",
                 "</script>",
                 "</html>",
             )
         ),
     )
-    yield body.encode()
+
+
+def store_page(module: str, entry: CachedPage) -> None:
+    """Add a rendered page to the bounded page cache.
+
+    Args:
+        module: module string
+        entry: the rendered page
+    """
+    page_cache[module] = entry
+    page_cache.move_to_end(module)
+    while len(page_cache) > PAGE_CACHE_SIZE:
+        page_cache.popitem(last=False)
+    rewatch(module)
+
+
+def rewatch(module: str) -> None:
+    """Update the event streams watching a page after it is rendered.
+
+    Args:
+        module: module string
+    """
+    paths = None
+    for queue, stream in list(streams.items()):
+        if module in stream.watched:
+            paths = paths or watched_paths(module)
+            if stream.watched[module] != paths:
+                stream.watched[module] = paths
+                union = frozenset().union(*stream.watched.values())
+                stream.watcher.resubscribe(queue, union)
+
+
+def cached_page(module: str) -> typing.Tuple[typing.Optional[CachedPage], tuple]:
+    """Look up a rendered page that is still fresh.
+
+    The freshness stamp is taken before any new render, so a change made
+    while the page renders is noticed on the next request. A page that
+    needs rendering starts a new generation, so the render picks up
+    changed modules. The watch list
+    comes from the previous render; files first found by a render are
+    stamped when it finishes.
+
+    Args:
+        module: module string
+
+    Returns:
+        cached page if its sources are unchanged, and the current stamp
+    """
+    global render_generation  # noqa:WPS420
+    entry = page_cache.get(module)
+    stamp = freshness(module, entry.watchlist if entry else ())
+    if entry and entry.stamp == stamp:
+        page_cache.move_to_end(module)
+        return (entry, stamp)
+    render_generation += 1  # noqa:WPS442
+    return (None, stamp)
+
+
+async def page_body_gen(body: bytes) -> typing.AsyncGenerator[bytes, None]:
+    """Asynchronously yield page body.
+
+    Args:
+        body: generated page, in bytes
+
+    Yields:
+        Body of generated page, in bytes
+    """
+    yield body
 
 
 async def page_body(scope: dict) -> Response:
     """Check if path exists and return generated blob if so.
 
+    A page that needs rendering is streamed as it is generated. A cached
+    page carries an ETag, and browsers revalidating with it get a 304.
+    Headers are sent before a streamed page is complete, so a page still
+    rendering when its response starts has no ETag; a render that has
+    already finished, as with a process pool, gets the one it is cached
+    with.
+
     Args:
         scope: ASGI scope dict
 
@@ -114,58 +749,100 @@ async def page_body(scope: dict) -> Response:
         response
     """
     module = routes().get(scope["path"], "")
-    if module:
-        status = 200
-
-        response = Response(page_body_gen(module), status)
-    else:
-        response = await not_found(scope)
-    return response
-
-
-def last_modified_times(files: list) -> dict:
-    """Check last modified on all files in list.
+    if not module:
+        return await not_found(scope)
+    headers = [(b"content-type", b"text/html"), (b"cache-control", b"no-cache")]
+    page, stamp = cached_page(module)
+    if page is None:
+        pending = page_render(module, stamp)
+        await pending.started()
+        if not pending.done:
+            return Response(pending.follow(), 200, headers)
+        body = b"".join(pending.chunks)
+        headers.append((b"etag", page_etag(body).encode()))
+        return Response(page_body_gen(body), 200, headers)
+    headers.append((b"etag", page.etag.encode()))
+    if request_header(scope, b"if-none-match") == page.etag.encode():
+        return Response(page_body_gen(b""), 304, headers)
+    return Response(page_body_gen(page.body), 200, headers)
+
+
+def watched_paths(module: str) -> typing.FrozenSet[pathlib.Path]:
+    """List the files whose changes should reload a page.
+
+    The files recorded by the last render are used when the page is
+    cached, else those recorded by the last build. The module is only
+    loaded for pages that have never been rendered.
 
     Args:
-        files: list of file paths
+        module: module string
 
     Returns:
-        dict of files and timestamps
+        resolved paths of the module source and the files it depends on
     """
-    return {filepath: filepath.stat().st_mtime for filepath in files}
+    entry = page_cache.get(module)
+    if entry is not None:
+        watchlist = list(entry.watchlist)
+    else:
+        graph = enerator.deps.read_graph()
+        if module in graph:
+            watchlist = [str(pathlib.Path.cwd() / path) for path in graph[module]]
+        else:
+            rel, _ = load_module(module)
+            watchlist = rel.get("watch", [])
+    modpath = module_to_path(module)
+    paths = [modpath.joinpath(path) for path in watchlist]
+    source = module_source(module)
+    if source is not None:
+        paths.append(source)
+    return frozenset(path.resolve() for path in paths)
 
 
-async def sse_body_gen(  # noqa:WPS210
-    module: str, tls: bool
+async def sse_body_gen(
+    modules: typing.Iterable[str],
 ) -> typing.AsyncGenerator[bytes, None]:
-    """Asynchronously yield event stream.
+    """Asynchronously yield an event stream covering several pages.
+
+    The stream opens with a small padding comment, so that buffering
+    proxies and browsers pass it on at once, and carries a comment every
+    HEARTBEAT_INTERVAL seconds while idle. Each change event names the
+    page module affected. The files watched for a page are updated each
+    time it is rendered, so files it starts to use are watched too.
 
     Args:
-        module: module string
-        tls: using https?
+        modules: module strings of the pages to watch
 
     Yields:
         bytestream in a format to be consumed by EventSource
     """
-    first_iteration = True
-    rel, _ = load_module(module)
-    watchlist = rel.get("watch", [])
-    modpath = module_to_path(module)
-    paths = [modpath.joinpath(path) for path in watchlist]
-    modified = last_modified_times(paths)
-    while True:
-        changed = last_modified_times(paths)
-        if changed != modified:
-            modified = changed
-            if first_iteration and not tls:
-                yield f": {'.' * 2 * MEG}\n\n".encode()
-                first_iteration = False
-            yield "data: modified\n\n".encode()
-        await asyncio.sleep(2)
+    watched = {module: watched_paths(module) for module in modules}
+    watcher = shared_watcher()
+    queue = watcher.subscribe(frozenset().union(*watched.values()))
+    streams[queue] = Stream(watcher, watched)
+    try:
+        yield f": {' ' * SSE_PADDING}\nretry: {SSE_RETRY}\n\n".encode()
+        while True:
+            try:
+                changed = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield b":\n\n"
+                continue
+            events = (
+                f"data: {module}\n\n"
+                for module, paths in watched.items()
+                if paths & changed
+            )
+            yield "".join(events).encode()
+    finally:
+        streams.pop(queue, None)
+        watcher.unsubscribe(queue)
 
 
 async def sse(scope: dict) -> Response:
-    """Stream events.
+    """Stream change events for the pages named in the query string.
+
+    Pages are named by repeated module parameters, as in
+    /sse?module=a&module=b; /sse/<module> names a single page.
 
     Args:
         scope: ASGI scope dict
@@ -173,13 +850,16 @@ async def sse(scope: dict) -> Response:
     Returns:
         response
     """  # noqa:DAR301
-    status = 200
-    tls = scope["scheme"] == "https"
-    module = scope["path"].split("/", 2)[2]
-
+    query = urllib.parse.parse_qs(scope.get("query_string", b"").decode())
+    modules = list(dict.fromkeys(query.get("module", [])))
+    path_module = scope["path"].split("/", 2)[2:]
+    if path_module and path_module[0]:
+        modules.append(path_module[0])
+    if not modules:
+        return await not_found(scope)
     return Response(
-        sse_body_gen(module, tls),
-        status,
+        sse_body_gen(modules),
+        200,
         [
             (b"content-type", b"text/event-stream"),
             (b"cache-control", b"no-cache"),
@@ -188,8 +868,25 @@ async def sse(scope: dict) -> Response:
     )
 
 
+async def reload_worker(scope: dict) -> Response:
+    """Serve the shared worker that multiplexes reload events.
+
+    Args:
+        scope: ASGI scope dict
+
+    Returns:
+        response
+    """
+    headers = [
+        (b"content-type", b"text/javascript"),
+        (b"cache-control", b"no-cache"),
+    ]
+    return Response(page_body_gen(RELOAD_WORKER.encode()), 200, headers)
+
+
 ROUTES = {
     "assets": static_body,
+    "reload.js": reload_worker,
     "sse": sse,
 }
 
@@ -204,6 +901,8 @@ async def app(scope: dict, receive: typing.Callable, send: typing.Callable) -> N
     """
     route_key = scope["path"].split("/", 2)[1]
     response = await ROUTES.get(route_key, page_body)(scope)
+    extensions = scope.get("extensions") or {}
+    span = response.file_span
 
     await send(
         {
@@ -212,10 +911,25 @@ async def app(scope: dict, receive: typing.Callable, send: typing.Callable) -> N
             "headers": response.headers,
         }
     )
-    async for chunk in response.body_gen:
-        await send({"type": "http.response.body", "body": chunk, "more_body": True})
-
-    await send({"type": "http.response.body", "body": b""})
+    if span and span.whole and "http.response.pathsend" in extensions:
+        await response.body_gen.aclose()
+        await send({"type": "http.response.pathsend", "path": str(span.path)})
+    elif span and "http.response.zerocopy" in extensions:
+        await response.body_gen.aclose()
+        with span.path.open("rb") as fp:
+            await send(
+                {
+                    "type": "http.response.zerocopy",
+                    "file": fp,
+                    "offset": span.offset,
+                    "count": span.length,
+                    "more_body": False,
+                }
+            )
+    else:
+        async for chunk in response.body_gen:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
 
 
 def preview_page() -> uvicorn.Server:
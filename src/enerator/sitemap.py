@@ -1,48 +1,304 @@
 """Sitemap json config file handling."""
 
 
+import contextlib
 import functools
+import os
 import pathlib
+import time
 import typing
 
+try:
+    import fcntl  # noqa:WPS433
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
 SITEMAP = pathlib.Path("pages.txt")
+LOCK_TIMEOUT = 10
+LOCK_STALE = 60
+LOCK_POLL = 0.01
 
+T = typing.TypeVar("T")
 
-@functools.lru_cache(maxsize=2)
-def sitemap_read() -> list:
+
+class SitemapIndex(typing.NamedTuple):
+    """Ordered, de-duplicated sitemap contents."""
+
+    modules: list
+    positions: typing.Dict[str, int]
+
+
+def stat_key(path: pathlib.Path) -> typing.Optional[tuple]:
+    """Identify the current version of a file.
+
+    Args:
+        path: file path
+
+    Returns:
+        inode, modification time and size, or None if the file is missing
+    """
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class MtimeCache(typing.Generic[T]):
+    """A function reading SITEMAP, cached until the file changes.
+
+    Unlike lru_cache, this notices edits made by other processes. Like
+    lru_cache, it has a cache_clear() method.
+    """
+
+    def __init__(self, func: typing.Callable[[], T]) -> None:
+        """Wrap a function.
+
+        Args:
+            func: function reading SITEMAP
+        """
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.cache: typing.Dict[tuple, T] = {}
+
+    def __call__(self) -> T:
+        """Call the function unless the sitemap is unchanged since last time.
+
+        Returns:
+            the function's result
+        """
+        key = (os.path.abspath(SITEMAP), stat_key(SITEMAP))
+        if key not in self.cache:
+            self.cache.clear()
+            self.cache[key] = self.func()
+        return self.cache[key]
+
+    def cache_clear(self) -> None:
+        """Forget the cached result."""
+        self.cache.clear()
+
+
+def mtime_cache(func: typing.Callable[[], T]) -> MtimeCache[T]:
+    """Cache the result of reading the sitemap until the file changes.
+
+    Args:
+        func: function reading SITEMAP
+
+    Returns:
+        decorated function
+    """
+    return MtimeCache(func)
+
+
+@mtime_cache
+def sitemap_index() -> SitemapIndex:
     """Load page information from sitemap file.
 
+    Blank lines, comments and repeated modules are skipped.
+
     Returns:
-        A list of modules to include in site
+        the modules in file order, with each module's position
     """
     try:
         with SITEMAP.open() as fp:
-            sitemap = [line.strip() for line in fp if not line.startswith("#")]
+            lines = (line.strip() for line in fp if not line.startswith("#"))
+            positions = {line: 0 for line in lines if line}
     except FileNotFoundError:
-        sitemap = []
-    return sitemap
+        positions = {}
+    modules = list(positions)
+    for position, module in enumerate(modules):
+        positions[module] = position
+    return SitemapIndex(modules, positions)
+
+
+def sitemap_read() -> list:
+    """Load page information from sitemap file.
+
+    Returns:
+        A list of modules to include in site
+    """
+    return sitemap_index().modules
+
+
+sitemap_read.cache_clear = sitemap_index.cache_clear  # type: ignore
+
+
+def sitemap_contains(module: str) -> bool:
+    """Check whether a module is in the sitemap.
+
+    Args:
+        module: string form of Python module name
+
+    Returns:
+        True if the module is listed
+    """
+    return module in sitemap_index().positions
 
 
 def sitemap_loader() -> typing.Callable:
     """Parse each module in sitemap for related info."""
 
 
+@contextlib.contextmanager
+def sitemap_lock() -> typing.Iterator[None]:
+    """Hold an exclusive lock on the sitemap file.
+
+    The lock is a file next to the sitemap, locked with flock() where
+    available, so a crashed process never leaves it held. Elsewhere the
+    lock is the file's existence; such a lock that has not changed for
+    LOCK_STALE seconds is assumed to be left over from a crashed process
+    and is broken.
+
+    Yields:
+        None, while the lock is held
+
+    Raises:
+        TimeoutError: if the lock could not be acquired within LOCK_TIMEOUT
+            seconds
+    """
+    lock_path = SITEMAP.with_name(f"{SITEMAP.name}.lock")
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while True:
+        fd = try_lock(lock_path)
+        if fd is not None:
+            break
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"could not lock {SITEMAP}")
+        time.sleep(LOCK_POLL)
+    try:
+        yield
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            lock_path.unlink()
+        os.close(fd)
+
+
+def try_lock(lock_path: pathlib.Path) -> typing.Optional[int]:
+    """Make one attempt to take the sitemap lock.
+
+    With flock(), the lock file is removed on release, so a lock taken on
+    a file that has since been removed or replaced does not count.
+
+    Args:
+        lock_path: lock file path
+
+    Returns:
+        open descriptor of the lock file if the lock was taken, else None
+    """
+    if fcntl is None:
+        return try_lock_file(lock_path)
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+    with contextlib.suppress(BlockingIOError, FileNotFoundError):
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        if os.stat(lock_path).st_ino == os.fstat(fd).st_ino:
+            return fd
+    os.close(fd)
+    return None
+
+
+def try_lock_file(lock_path: pathlib.Path) -> typing.Optional[int]:
+    """Make one attempt to take the sitemap lock by creating the lock file.
+
+    A stale lock file is only removed if it is still the same file, so
+    two waiters cannot both break it and remove each other's new lock.
+
+    Args:
+        lock_path: lock file path
+
+    Returns:
+        open descriptor of the lock file if the lock was taken, else None
+    """
+    try:
+        return os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        key = stat_key(lock_path)
+    if key is not None and time.time() - key[1] / 1e9 > LOCK_STALE:
+        if stat_key(lock_path) == key:
+            with contextlib.suppress(FileNotFoundError):
+                lock_path.unlink()
+    return None
+
+
 def sitemap_add(module: str) -> None:
     """Update sitemap file with page information.
 
     Args:
         module: string form of Python module name
     """
-    sitemap = sitemap_read()
-    sitemap = sorted(sitemap + [module])
-    sitemap_write(sitemap)
+    sitemap_add_many((module,))
+
+
+def sitemap_add_many(modules: typing.Iterable[str]) -> list:
+    """Add modules to the sitemap file in a single update.
+
+    Modules already listed are left alone. The sitemap is kept sorted:
+    modules that sort after every existing entry are appended, otherwise
+    the file is rewritten once.
+
+    Args:
+        modules: string forms of Python module names
+
+    Returns:
+        the modules that were added
+    """
+    with sitemap_lock():
+        existing = sitemap_index()
+        added = sorted(
+            {module for module in modules if module not in existing.positions}
+        )
+        if not added:
+            return added
+        current = existing.modules
+        if current and current == sorted(current) and added[0] > current[-1]:
+            with SITEMAP.open("rb") as tail:
+                tail.seek(-1, os.SEEK_END)
+                separator = "" if tail.read() == b"\n" else "\n"
+            with SITEMAP.open("a") as fp:
+                fp.write(separator + "\n".join(added))
+            sitemap_index.cache_clear()
+        else:
+            sitemap_write(sorted(current + added))
+    return added
+
+
+def sitemap_remove_many(modules: typing.Iterable[str]) -> list:
+    """Remove modules from the sitemap file in a single update.
+
+    Args:
+        modules: string forms of Python module names
+
+    Returns:
+        the modules that were removed
+    """
+    with sitemap_lock():
+        existing = sitemap_index()
+        removed = {module for module in modules if module in existing.positions}
+        if removed:
+            sitemap_write(
+                [module for module in existing.modules if module not in removed]
+            )
+    return sorted(removed)
+
+
+def sitemap_remove(module: str) -> None:
+    """Remove a page from the sitemap file.
+
+    Args:
+        module: string form of Python module name
+    """
+    sitemap_remove_many((module,))
 
 
 def sitemap_write(sitemap: list) -> None:
     """Write page information to sitemap file.
 
+    The file is replaced atomically, so readers never see a partial
+    sitemap. Repeated modules are dropped.
+
     Args:
         sitemap: list of all page modules. Will overwrite existing.
     """
-    SITEMAP.write_text("\n".join(sitemap))
-    sitemap_read.cache_clear()
+    tmp_path = SITEMAP.with_name(f".{SITEMAP.name}.{os.getpid()}.tmp")
+    tmp_path.write_text("\n".join(dict.fromkeys(sitemap)))
+    os.replace(tmp_path, SITEMAP)
+    sitemap_index.cache_clear()
@@ -15,6 +15,8 @@ class Cmdargs(typing.NamedTuple):
     action: str = "store"
     default: typing.Any = None
     dest: typing.Optional[str] = None
+    choices: typing.Optional[typing.Sequence[str]] = None
+    nargs: typing.Optional[str] = None
 
 
 @functools.lru_cache(maxsize=2)
@@ -62,7 +64,7 @@ def subcommand(arglist: typing.Tuple[Cmdargs, ...]) -> typing.Callable:
         description = (func.__doc__ or "No description").partition("\n")[0]
         parser = subparsers.add_parser(func.__name__, description=description)
         for arg in arglist:
-            kwargs: typing.Dict[str, typing.Union[str, type]] = {
+            kwargs: typing.Dict[str, typing.Any] = {
                 "action": arg.action,
                 "help": arg.desc,
             }
@@ -72,6 +74,10 @@ def subcommand(arglist: typing.Tuple[Cmdargs, ...]) -> typing.Callable:
                 kwargs["dest"] = arg.dest
             if arg.cast is not None:
                 kwargs["type"] = arg.cast
+            if arg.choices is not None:
+                kwargs["choices"] = arg.choices
+            if arg.nargs is not None:
+                kwargs["nargs"] = arg.nargs
             parser.add_argument(*arg.args, **kwargs)  # type: ignore
         parser.set_defaults(func=func)
         return func
@@ -0,0 +1,192 @@
+"""Per-page, per-stage build timing.
+
+Timing is off by default; instrumented functions then cost a single flag
+check per call. Stage times are inclusive, so generate_page includes the
+md_highlight and md_parse time spent inside the page. Each page's
+"total" covers its whole build. Counters, such as highlight cache hits,
+are kept alongside the stage times, so they too come back from worker
+processes with each page.
+"""
+
+import functools
+import time
+import typing
+
+STAGES = (
+    "load_module",
+    "generate_page",
+    "md_highlight",
+    "md_parse",
+    "minify",
+    "write",
+)
+COUNTERS = (
+    "highlight_blocks",
+    "highlight_store_hits",
+    "highlight_rendered",
+)
+
+enabled = False
+current_page = ""
+page_times: typing.Dict[str, typing.Dict[str, float]] = {}
+
+Func = typing.TypeVar("Func", bound=typing.Callable[..., typing.Any])
+
+
+def enable(flag: bool = True) -> None:
+    """Turn timing on or off, forgetting earlier results.
+
+    Args:
+        flag: True to record timings
+    """
+    global enabled  # noqa:WPS420
+    enabled = flag  # noqa:WPS442
+    page_times.clear()
+
+
+def set_page(module: str) -> None:
+    """Attribute subsequent timings to a page.
+
+    Args:
+        module: string form of Python module name
+    """
+    global current_page  # noqa:WPS420
+    current_page = module  # noqa:WPS442
+
+
+def record(stage: str, seconds: float) -> None:
+    """Add time to a stage of the current page.
+
+    Args:
+        stage: stage name
+        seconds: elapsed time
+    """
+    stages = page_times.setdefault(current_page, {})
+    stages[stage] = stages.get(stage, 0) + seconds
+
+
+def count(counter: str, number: int = 1) -> None:
+    """Add to a counter of the current page, if timing is enabled.
+
+    Args:
+        counter: counter name
+        number: amount to add
+    """
+    if enabled:
+        record(counter, number)
+
+
+def counter_totals() -> typing.Dict[str, int]:
+    """Sum the counters over all pages.
+
+    Returns:
+        total of each counter
+    """
+    return {
+        counter: int(sum(stages.get(counter, 0) for stages in page_times.values()))
+        for counter in COUNTERS
+    }
+
+
+def highlight_summary(totals: typing.Mapping[str, int]) -> str:
+    """Describe where highlighted code blocks came from.
+
+    Args:
+        totals: counter totals
+
+    Returns:
+        block counts from memory, from the on-disk store and highlighted anew
+    """
+    blocks = totals["highlight_blocks"]
+    stored = totals["highlight_store_hits"]
+    rendered = totals["highlight_rendered"]
+    memory = blocks - stored - rendered
+    return (
+        f"Highlight cache: {blocks} blocks, {memory} from memory, "
+        f"{stored} from disk, {rendered} highlighted"
+    )
+
+
+def timed(stage: str) -> typing.Callable[[Func], Func]:
+    """Decorate a function so its calls are timed as a stage.
+
+    Args:
+        stage: stage name
+
+    Returns:
+        decorator
+    """
+
+    def decorator(func: Func) -> Func:
+        @functools.wraps(func)
+        def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+
+        return typing.cast(Func, wrapper)
+
+    return decorator
+
+
+def timed_iter(stage: str, iterable: typing.Iterable) -> typing.Iterator:
+    """Time the production of each item of an iterable as a stage.
+
+    Args:
+        stage: stage name
+        iterable: items to time, such as a generator
+
+    Returns:
+        iterator over the same items
+    """
+    if not enabled:
+        return iter(iterable)
+    return _timed_iter(stage, iter(iterable))
+
+
+def _timed_iter(stage: str, iterator: typing.Iterator) -> typing.Iterator:
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record(stage, time.perf_counter() - start)
+            return
+        record(stage, time.perf_counter() - start)
+        yield item
+
+
+def report(top: int = 10) -> str:
+    """Summarize recorded timings.
+
+    Args:
+        top: number of slowest pages to list
+
+    Returns:
+        stage breakdown, highlight cache use and slowest pages, as text
+    """
+    totals = {stage: 0.0 for stage in STAGES}
+    for stages in page_times.values():
+        for stage in STAGES:
+            totals[stage] += stages.get(stage, 0)
+
+    lines = ["Stage breakdown (inclusive):"]
+    lines.extend(f"  {stage:<14} {seconds:9.3f}s" for stage, seconds in totals.items())
+    counters = counter_totals()
+    if counters["highlight_blocks"]:
+        lines.append(highlight_summary(counters))
+    slowest = sorted(
+        page_times.items(), key=lambda item: item[1].get("total", 0), reverse=True
+    )
+    lines.append(f"Slowest {min(top, len(slowest))} pages:")
+    for module, stages in slowest[:top]:
+        detail = ", ".join(
+            f"{stage} {stages[stage]:.3f}s" for stage in STAGES if stage in stages
+        )
+        total = stages.get("total", 0)
+        lines.append(f"  {total:9.3f}s  {module or '(none)'}  ({detail})")
+    return "\n".join(lines)
@@ -0,0 +1,74 @@
+"""Index of page URLs read without importing page modules.
+
+The path of each page is read statically from the CONFIG dict in the
+module source. Results are kept in .enerator/urls.json and only re-read
+when the module's modification time changes.
+"""
+
+import ast
+import contextlib
+import importlib
+import pathlib
+import typing
+
+from enerator.cache import CACHE_DIR, read_json, write_json
+from enerator.manifest import module_source
+from enerator.sitemap import sitemap_read
+
+URL_INDEX = CACHE_DIR / "urls.json"
+
+
+def static_path(source: pathlib.Path) -> typing.Optional[str]:
+    """Read CONFIG["path"] from module source without running it.
+
+    Args:
+        source: path to the module source
+
+    Returns:
+        the page path, or None if it is not a literal in a CONFIG dict
+    """
+    tree = ast.parse(source.read_bytes(), str(source))
+    for node in tree.body:
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, ast.AnnAssign):
+            targets = [node.target]
+        else:
+            continue
+        config_assign = any(
+            isinstance(target, ast.Name) and target.id == "CONFIG" for target in targets
+        )
+        if config_assign and isinstance(node.value, ast.Dict):
+            for key, value in zip(node.value.keys, node.value.values):
+                if isinstance(key, ast.Constant) and key.value == "path":
+                    with contextlib.suppress(ValueError):
+                        return str(ast.literal_eval(value))
+    return None
+
+
+def url_index() -> typing.Dict[str, str]:
+    """Map every module in the sitemap to its page path.
+
+    Modules whose CONFIG cannot be read statically are imported instead.
+
+    Returns:
+        dict of page paths keyed by module name
+    """
+    cached = read_json(URL_INDEX)
+    index = {}
+    entries = {}
+    for module in sitemap_read():
+        source = module_source(module)
+        mtime = source.stat().st_mtime_ns if source else None
+        entry = cached.get(module)
+        if entry and mtime is not None and entry[0] == mtime:
+            path = entry[1]
+        else:
+            path = static_path(source) if source else None
+            if path is None:
+                path = importlib.import_module(module).CONFIG["path"]  # type: ignore
+        index[module] = path
+        entries[module] = [mtime, path]
+    if entries != cached:
+        write_json(URL_INDEX, entries)
+    return index
@@ -0,0 +1,261 @@
+"""Shared file watcher for the preview server.
+
+One watcher per event loop tracks the union of all watched paths and fans
+change notifications out to subscribers through asyncio queues. On Linux
+it uses inotify; elsewhere it falls back to a single polling task.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import functools
+import os
+import pathlib
+import struct
+import sys
+import typing
+import weakref
+
+POLL_INTERVAL = 2
+READ_SIZE = 65536
+EVENT = struct.Struct("iIII")
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_IGNORED = 0x8000
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+
+Paths = typing.FrozenSet[pathlib.Path]
+
+
+def last_modified(path: pathlib.Path) -> typing.Optional[int]:
+    """Check last modified time of a file.
+
+    Args:
+        path: file path
+
+    Returns:
+        modification time in nanoseconds, or None if the file is missing
+    """
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+@functools.lru_cache(maxsize=1)
+def libc() -> typing.Optional[ctypes.CDLL]:
+    """Load the C library for inotify calls.
+
+    Returns:
+        the C library, or None when inotify is not available
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    lib = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if not hasattr(lib, "inotify_init1"):
+        return None
+    return lib
+
+
+class Watcher(object):
+    """Watch files and notify subscribed queues when they change."""
+
+    def __init__(
+        self, interval: float = POLL_INTERVAL, use_inotify: bool = True
+    ) -> None:
+        """Set up an idle watcher.
+
+        Args:
+            interval: seconds between checks when polling
+            use_inotify: use inotify where available instead of polling
+        """
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.queues: typing.Dict[asyncio.Queue, Paths] = {}
+        self.fd: typing.Optional[int] = None
+        self.dirs: typing.Dict[pathlib.Path, int] = {}
+        self.wds: typing.Dict[int, pathlib.Path] = {}
+        self.poller: typing.Optional[asyncio.Task] = None
+        self.loop: typing.Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, paths: typing.Iterable[pathlib.Path]) -> asyncio.Queue:
+        """Start receiving change events for some paths.
+
+        Events for one subscriber are coalesced: while a notification is
+        waiting to be read, further changes are merged into it rather than
+        queueing up behind it.
+
+        Args:
+            paths: files to watch
+
+        Returns:
+            queue that receives a set of changed paths on each change
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.resubscribe(queue, paths)
+        return queue
+
+    def resubscribe(
+        self, queue: asyncio.Queue, paths: typing.Iterable[pathlib.Path]
+    ) -> None:
+        """Change the paths a subscriber watches.
+
+        Args:
+            queue: queue returned by subscribe()
+            paths: files to watch from now on
+        """
+        self.queues[queue] = frozenset(path.resolve() for path in paths)
+        if self.fd is None and self.poller is None:
+            self.start()
+        self.update_watches()
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Stop receiving change events.
+
+        The watcher releases its resources once nobody is subscribed.
+
+        Args:
+            queue: queue returned by subscribe()
+        """
+        self.queues.pop(queue, None)
+        if not self.queues:
+            self.stop()
+        else:
+            self.update_watches()
+
+    def update_watches(self) -> None:
+        """Watch the directories of all watched paths, and no others."""
+        if self.fd is None:
+            return
+        needed = {path.parent for paths in self.queues.values() for path in paths}
+        for directory in set(self.dirs) - needed:
+            self.remove_watch(directory)
+        for directory in needed:
+            self.add_watch(directory)
+
+    def publish(self, changed: typing.Set[pathlib.Path]) -> None:
+        """Notify subscribers watching any of the changed paths.
+
+        Args:
+            changed: paths that changed
+        """
+        for queue, paths in self.queues.items():
+            if paths & changed:
+                try:
+                    queue.put_nowait(changed)
+                except asyncio.QueueFull:
+                    queue.put_nowait(queue.get_nowait() | changed)
+
+    def start(self) -> None:
+        """Start inotify if possible, else the polling task."""
+        self.loop = asyncio.get_running_loop()
+        lib = libc() if self.use_inotify else None
+        fd = lib.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC) if lib else -1
+        if fd >= 0:
+            self.fd = fd
+            self.loop.add_reader(fd, self.read_events)
+        else:
+            self.poller = self.loop.create_task(self.poll())
+
+    def stop(self) -> None:
+        """Release the inotify descriptor or polling task."""
+        if self.fd is not None:
+            if self.loop is not None and not self.loop.is_closed():
+                self.loop.remove_reader(self.fd)
+            os.close(self.fd)
+            self.fd = None
+            self.dirs.clear()
+            self.wds.clear()
+        if self.poller is not None:
+            self.poller.cancel()
+            self.poller = None
+
+    def add_watch(self, directory: pathlib.Path) -> None:
+        """Watch a directory with inotify.
+
+        Directories are watched rather than files so that editors which
+        replace a file by renaming over it are still noticed.
+
+        Args:
+            directory: directory containing watched files
+        """
+        if directory in self.dirs:
+            return
+        wd = libc().inotify_add_watch(  # type: ignore
+            self.fd, os.fsencode(directory), WATCH_MASK
+        )
+        if wd >= 0:
+            self.dirs[directory] = wd
+            self.wds[wd] = directory
+
+    def remove_watch(self, directory: pathlib.Path) -> None:
+        """Stop watching a directory.
+
+        Args:
+            directory: directory previously passed to add_watch()
+        """
+        wd = self.dirs.pop(directory)
+        self.wds.pop(wd, None)
+        libc().inotify_rm_watch(self.fd, wd)  # type: ignore
+
+    def read_events(self) -> None:
+        """Read pending inotify events and publish the changed paths."""
+        try:
+            data = os.read(self.fd, READ_SIZE)  # type: ignore
+        except BlockingIOError:
+            return
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            directory = self.wds.get(wd)
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                if directory is not None:
+                    self.dirs.pop(directory, None)
+            elif directory is not None and name:
+                changed.add(directory / os.fsdecode(name))
+        if changed:
+            self.publish(changed)
+
+    async def poll(self) -> None:
+        """Check modification times of all watched paths until stopped."""
+        modified: typing.Dict[pathlib.Path, typing.Optional[int]] = {}
+        while self.queues:
+            paths = frozenset().union(*self.queues.values())
+            current = {path: last_modified(path) for path in paths}
+            changed = {
+                path
+                for path, mtime in current.items()
+                if path in modified and modified[path] != mtime
+            }
+            modified = current
+            if changed:
+                self.publish(changed)
+            await asyncio.sleep(self.interval)
+
+
+watchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Watcher]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def shared_watcher() -> Watcher:
+    """Get the watcher shared by everything on the running event loop.
+
+    Returns:
+        the event loop's watcher
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in watchers:
+        watchers[loop] = Watcher()
+    return watchers[loop]
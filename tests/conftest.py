@@ -13,6 +13,7 @@ import pytest  # type:ignore
 
 import enerator.add
 import enerator.commands
+import enerator.generate
 import enerator.sitemap
 
 PAGES = {
@@ -37,6 +38,8 @@ def set_path(tmp_path: pathlib.Path) -> typing.Generator:
     yield tmp_path
     os.chdir(old_cwd)
     enerator.sitemap.sitemap_read.cache_clear()
+    enerator.generate.all_urls.cache_clear()
+    enerator.generate.routes.cache_clear()
 
 
 @pytest.fixture
@@ -4,6 +4,7 @@ import importlib
 import pathlib
 
 import enerator.add
+import enerator.sitemap
 
 
 def test_module_to_path() -> None:
@@ -27,3 +28,40 @@ def test_add(set_path) -> None:
     )
     page = importlib.import_module(module)
     assert page.page({})  # type: ignore
+
+
+def test_add_many(set_path) -> None:
+    pages = [
+        ("bulk.home", pathlib.PurePosixPath("/")),
+        ("bulk.docs.intro", pathlib.PurePosixPath("/docs/intro")),
+        ("bulk.docs.usage", pathlib.PurePosixPath("/docs/usage")),
+        ("bulk.layouts.base", None),
+    ]
+    dirpaths = enerator.add.add_many(pages)
+    assert [path.name for path in dirpaths] == ["home", "intro", "usage", "base"]
+    assert (set_path / "bulk" / "docs" / "__init__.py").exists()
+    assert enerator.sitemap.sitemap_read() == [
+        "bulk.docs.intro",
+        "bulk.docs.usage",
+        "bulk.home",
+    ]
+    page = importlib.import_module("bulk.docs.usage")
+    assert page.CONFIG["path"] == "/docs/usage"  # type: ignore
+
+
+def test_add_many_keeps_existing(set_path) -> None:
+    module = "kept.home"
+    dirpath = enerator.add.add(module, pathlib.PurePosixPath("/"))
+    (dirpath / "__init__.py").write_text("CONFIG = {'path': '/'}\n")
+    enerator.add.add_many([(module, pathlib.PurePosixPath("/other"))])
+    assert (dirpath / "__init__.py").read_text() == "CONFIG = {'path': '/'}\n"
+    assert enerator.sitemap.sitemap_read() == [module]
+
+
+def test_read_pages_csv(set_path) -> None:
+    csv_path = set_path / "pages.csv"
+    csv_path.write_text("module,sitepath\nsite.home, /\n\nsite.base,\n")
+    assert enerator.add.read_pages_csv(csv_path) == [
+        ("site.home", pathlib.PurePosixPath("/")),
+        ("site.base", None),
+    ]
@@ -0,0 +1,150 @@
+"""Tests for the asset pipeline."""
+
+import os
+import pathlib
+
+import enerator.add
+import enerator.assets
+import enerator.generate
+from enerator.output import OutputWriter
+
+ASSET_PAGE = """
+from enerator.assets import asset_url
+
+CONFIG = {{"path": "{sitepath}"}}
+
+
+def page(rel):
+    return asset_url("css/site.css")
+"""
+
+
+def make_assets(root: pathlib.Path) -> None:
+    (root / "css").mkdir(parents=True)
+    (root / "css" / "site.css").write_text("body { color: black; }\n")
+    (root / "logo.png").write_bytes(b"\x89PNG")
+
+
+def test_fingerprinted():
+    assert enerator.assets.fingerprinted("css/site.css", "abcdef" * 8) == (
+        "css/site.abcdefabcdef.css"
+    )
+    assert enerator.assets.fingerprinted("LICENSE", "0123456789ab") == (
+        "LICENSE.0123456789ab"
+    )
+
+
+def test_asset_url():
+    assert enerator.assets.asset_url("css/site.css") == "/assets/css/site.css"
+    enerator.assets.set_urls({"/assets/css/site.css": "/assets/css/site.1.css"})
+    try:
+        assert enerator.assets.asset_url("/css/site.css") == "/assets/css/site.1.css"
+    finally:
+        enerator.assets.set_urls({})
+
+
+def test_publish_assets_copy_on_change(set_path):
+    make_assets(set_path / "assets")
+    out = pathlib.Path("out")
+    with OutputWriter(out) as writer:
+        published = enerator.assets.publish_assets(writer)
+    css = out / "assets" / "css" / "site.css"
+    assert published["/assets/css/site.css"] == "/assets/css/site.css"
+    assert css.read_text() == "body { color: black; }\n"
+    assert (out / "assets" / "logo.png").read_bytes() == b"\x89PNG"
+    stamp = css.stat().st_ino, css.stat().st_mtime_ns
+    (set_path / "assets" / "logo.png").unlink()
+    with OutputWriter(out) as writer:
+        enerator.assets.publish_assets(writer)
+    assert (css.stat().st_ino, css.stat().st_mtime_ns) == stamp
+    assert not (out / "assets" / "logo.png").exists()
+
+
+def test_publish_assets_fingerprint(set_path):
+    make_assets(set_path / "assets")
+    out = pathlib.Path("out")
+    with OutputWriter(out, encodings=("gzip",)) as writer:
+        published = enerator.assets.publish_assets(writer, fingerprint=True)
+    url = published["/assets/css/site.css"]
+    assert url.startswith("/assets/css/site.") and url.endswith(".css")
+    assert pathlib.Path(f"out{url}").exists()
+    assert pathlib.Path(f"out{url}.gz").exists()
+    (set_path / "assets" / "css" / "site.css").write_text("body { color: red; }\n")
+    with OutputWriter(out, encodings=("gzip",)) as writer:
+        new_url = enerator.assets.publish_assets(writer, fingerprint=True)[
+            "/assets/css/site.css"
+        ]
+    assert new_url != url
+    assert sorted(os.listdir("out/assets/css")) == sorted(
+        (pathlib.Path(new_url).name, f"{pathlib.Path(new_url).name}.gz")
+    )
+
+
+def test_publish_assets_compressed_name(set_path, monkeypatch):
+    (set_path / "assets").mkdir()
+    (set_path / "assets" / "data.tar.gz").write_bytes(b"\x1f\x8b")
+    out = pathlib.Path("out")
+    with OutputWriter(out, encodings=("gzip",)) as writer:
+        enerator.assets.publish_assets(writer)
+    placed = []
+    monkeypatch.setattr(
+        enerator.assets, "place_file", lambda *args: placed.append(args)
+    )
+    with OutputWriter(out, encodings=("gzip",)) as writer:
+        enerator.assets.publish_assets(writer)
+    assert (out / "assets" / "data.tar.gz").exists()
+    assert not placed
+
+
+def test_publish_assets_link(set_path):
+    make_assets(set_path / "assets")
+    out = pathlib.Path("out")
+    with OutputWriter(out) as writer:
+        enerator.assets.publish_assets(writer, link=True)
+    source = set_path / "assets" / "logo.png"
+    assert (out / "assets" / "logo.png").samefile(source)
+
+
+def test_generate_site_assets(make_pages: dict) -> None:
+    make_assets(pathlib.Path("assets"))
+    enerator.assets.configure(fingerprint=True)
+    try:
+        enerator.generate.generate_site(pathlib.Path("out"), jobs=2)
+        url = enerator.assets.asset_url("css/site.css")
+    finally:
+        enerator.assets.configure()
+        enerator.assets.set_urls({})
+    assert url != "/assets/css/site.css"
+    assert pathlib.Path(f"out{url}").exists()
+
+
+def test_generate_site_asset_inputs(make_pages: dict, monkeypatch) -> None:
+    make_assets(pathlib.Path("assets"))
+    module, sitepath = next(iter(make_pages.items()))
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(ASSET_PAGE.format(sitepath=sitepath))
+    rendered = []
+    render_iter = enerator.generate.render_iter
+
+    def counting_render(context, rel):
+        rendered.append(context.module)
+        return render_iter(context, rel)
+
+    monkeypatch.setattr(enerator.generate, "render_iter", counting_render)
+    out = pathlib.Path("out")
+    enerator.assets.configure(fingerprint=True)
+    try:
+        enerator.generate.generate_site(out)
+        (pathlib.Path("assets") / "new.png").write_bytes(b"\x89PNG")
+        rendered.clear()
+        enerator.generate.generate_site(out)
+        assert not rendered
+        css = pathlib.Path("assets") / "css" / "site.css"
+        css.write_text("body { color: red; }\n")
+        paths = enerator.generate.generate_site(out)
+        url = enerator.assets.asset_url("css/site.css")
+    finally:
+        enerator.assets.configure()
+        enerator.assets.set_urls({})
+    assert rendered == [module]
+    assert paths[0].read_text() == url
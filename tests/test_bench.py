@@ -0,0 +1,16 @@
+"""Smoke test for the benchmark suite."""
+
+import json
+
+from benchmarks import bench
+
+
+def test_bench_main(tmp_path) -> None:
+    output = tmp_path / "results.json"
+    bench.main(
+        ["--pages", "3", "--paragraphs", "4", "--repeat", "1", "--output", str(output)]
+    )
+    report = json.loads(output.read_text())
+    assert report["params"]["pages"] == 3
+    assert report["results"]["full_build_seconds"] > 0
+    assert report["results"]["markdown"]["bytes"] > 0
@@ -0,0 +1,17 @@
+"""Tests for build cache helpers."""
+
+import enerator.cache
+
+
+def test_file_digest(set_path):
+    path = set_path / "data.txt"
+    assert enerator.cache.file_digest(path) is None
+    path.write_bytes(b"data")
+    assert enerator.cache.file_digest(path) == enerator.cache.digest(b"data")
+
+
+def test_json_roundtrip(set_path):
+    path = set_path / "cache" / "data.json"
+    assert enerator.cache.read_json(path) == {}
+    enerator.cache.write_json(path, {"key": ["value"]})
+    assert enerator.cache.read_json(path) == {"key": ["value"]}
@@ -5,8 +5,12 @@ import argparse
 import importlib
 import pathlib
 
+import enerator.add
 import enerator.commands
+import enerator.markdown
+import enerator.minify
 import enerator.sitemap
+import enerator.timing
 
 
 def test_cmdline_gen(set_path, capsys) -> None:
@@ -54,7 +58,70 @@ def test_cmdline_add_template(set_path) -> None:
     assert module1 not in pages
 
 
+def test_cmdline_add_from_file(set_path, capsys) -> None:
+    csv_path = set_path / "pages.csv"
+    csv_path.write_text("batch.home,/\nbatch.about,/about\nbatch.layout\n")
+    enerator.commands.parse_args(["add", "--from-file", str(csv_path)])
+    captured = capsys.readouterr()
+    assert len(captured.out.splitlines()) == 3
+    assert enerator.sitemap.sitemap_read() == ["batch.about", "batch.home"]
+    page = importlib.import_module("batch.layout")
+    assert page.page({})  # type: ignore
+
+
 def test_main(capsys) -> None:
     enerator.commands.main()
     captured = capsys.readouterr()
     assert "usage" in captured.out
+
+
+def test_cmdline_gen_site(make_pages, capsys) -> None:
+    enerator.commands.parse_args(["gen", "--output", "out", "--jobs", "2"])
+    captured = capsys.readouterr()
+    assert "pages/s" in captured.out
+    for sitepath in make_pages.values():
+        assert pathlib.Path(f"out{sitepath}/index.html").exists()
+
+
+def test_cmdline_gen_profile(make_pages, capsys) -> None:
+    args = ["gen", "-o", "out", "-j", "2", "--profile", "--profile-out", "gen.prof"]
+    enerator.commands.parse_args(args)
+    enerator.timing.enable(False)
+    captured = capsys.readouterr()
+    assert "Stage breakdown" in captured.out
+    for module in make_pages:
+        assert module in captured.out
+    assert pathlib.Path("gen.prof").exists()
+
+
+def test_cmdline_gen_profile_highlight(make_pages, capsys) -> None:
+    for module in make_pages:
+        init = enerator.add.module_to_path(module) / "__init__.py"
+        text = init.read_text().replace("!\"", '!\\n\\n```python\\nx = 1\\n```\\n"')
+        init.write_text(text)
+    args = ["gen", "-o", "out", "-j", "2", "--profile", "--highlight-cache"]
+    try:
+        enerator.commands.parse_args(args)
+    finally:
+        enerator.timing.enable(False)
+        enerator.markdown.set_highlight_store(None)
+    assert f"Highlight cache: {len(make_pages)} blocks" in capsys.readouterr().out
+
+
+def test_cmdline_gen_minify(make_pages, capsys) -> None:
+    args = ["gen", "-o", "out", "--minify", "--short-classes"]
+    try:
+        enerator.commands.parse_args(args)
+        captured = capsys.readouterr()
+        enerator.commands.parse_args(args)
+    finally:
+        enerator.minify.configure(False)
+    assert f"Minified {len(make_pages)} pages" in captured.out
+    assert "Minified 0 pages" in capsys.readouterr().out
+    assert pathlib.Path("out/highlight.css").exists()
+
+
+def test_render_pools() -> None:
+    import enerator.preview  # noqa:WPS433
+
+    assert enerator.commands.RENDER_POOLS == tuple(enerator.preview.RENDER_POOLS)
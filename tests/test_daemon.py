@@ -0,0 +1,63 @@
+"""Tests for the build daemon."""
+
+import pathlib
+import socket
+import threading
+
+import enerator.add
+import enerator.commands
+import enerator.daemon
+import enerator.deps
+
+
+def test_daemon_build(make_pages: dict, capsys) -> None:
+    server = enerator.daemon.make_server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        module, sitepath = next(iter(make_pages.items()))
+        args = ["gen", "--daemon", "-m", module, "-o", "out"]
+        enerator.commands.parse_args(args)
+        output_path = pathlib.Path(f"out{sitepath}/index.html".replace("//", "/"))
+        assert str(output_path.resolve()) in capsys.readouterr().out
+        assert "Hello" in output_path.read_text()
+        pyfile = enerator.add.module_to_path(module) / "__init__.py"
+        pyfile.write_text(pyfile.read_text().replace("Hello", "Goodbye"))
+        enerator.commands.parse_args(args)
+        assert "Goodbye" in output_path.read_text()
+        assert module in enerator.deps.module_stamps
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+    assert not enerator.daemon.SOCKET_PATH.exists()
+
+
+def test_daemon_unavailable(make_pages: dict, capsys) -> None:
+    module = next(iter(make_pages))
+    enerator.commands.parse_args(["gen", "--daemon", "-m", module, "-o", "out"])
+    captured = capsys.readouterr()
+    assert "no daemon is running" in captured.err
+    assert "index.html" in captured.out
+
+
+def test_daemon_no_reply(make_pages: dict, capsys) -> None:
+    path = enerator.daemon.SOCKET_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with socket.socket(socket.AF_UNIX) as listener:
+        listener.bind(str(path))
+        listener.listen()
+
+        def hang_up() -> None:
+            connection, _ = listener.accept()
+            connection.recv(65536)
+            connection.close()
+
+        thread = threading.Thread(target=hang_up, daemon=True)
+        thread.start()
+        module = next(iter(make_pages))
+        enerator.commands.parse_args(["gen", "--daemon", "-m", module, "-o", "out"])
+        thread.join()
+    captured = capsys.readouterr()
+    assert "no daemon is running" in captured.err
+    assert "index.html" in captured.out
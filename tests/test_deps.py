@@ -0,0 +1,124 @@
+"""Tests for page dependency recording."""
+
+import importlib
+import os
+import pathlib
+import sys
+
+import enerator.add
+import enerator.deps
+import enerator.generate
+import enerator.sitemap
+
+PAGE = '''
+import helper_{name}
+
+CONFIG = {{"path": "{sitepath}"}}
+
+
+def page(rel):
+    with open("data_{name}.txt") as fp:
+        return helper_{name}.wrap(fp.read())
+'''
+
+
+def test_recording(set_path) -> None:
+    pathlib.Path("read.txt").write_text("read")
+    found: set = set()
+    with enerator.deps.recording(found):
+        pathlib.Path("read.txt").read_text()
+        pathlib.Path("written.txt").write_text("written")
+    pathlib.Path("later.txt").write_text("later")
+    pathlib.Path("later.txt").read_text()
+    assert enerator.deps.project_files(found) == ["read.txt"]
+
+
+def test_recording_cached_import(set_path, monkeypatch) -> None:
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    pathlib.Path("cached_helper.py").write_text("VALUE = 1\n")
+    importlib.import_module("cached_helper")
+    del sys.modules["cached_helper"]  # noqa:WPS420
+    found: set = set()
+    with enerator.deps.recording(found):
+        importlib.import_module("cached_helper")
+    del sys.modules["cached_helper"]  # noqa:WPS420
+    assert enerator.deps.project_files(found) == ["cached_helper.py"]
+
+
+def test_dep_digest_once_per_build(set_path) -> None:
+    pathlib.Path("shared.py").write_text("first")
+    first = enerator.deps.dep_digest("shared.py")
+    pathlib.Path("shared.py").write_text("second")
+    assert enerator.deps.dep_digest("shared.py") == first
+    enerator.deps.reset_digests()
+    assert enerator.deps.dep_digest("shared.py") != first
+
+
+def test_generate_site_tracks_deps(make_pages: dict) -> None:
+    module, sitepath = next(iter(make_pages.items()))
+    name = module.replace(".", "_")
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(PAGE.format(name=name, sitepath=sitepath))
+    helper = pathlib.Path(f"helper_{name}.py")
+    helper.write_text("def wrap(text):\n    return f'<p>{text}</p>'\n")
+    data = pathlib.Path(f"data_{name}.txt")
+    data.write_text("first")
+    out = pathlib.Path("out")
+    paths = enerator.generate.generate_site(out)
+    assert paths[0].read_text() == "<p>first</p>"
+    graph = enerator.deps.read_graph()
+    assert str(data) in graph[module]
+    assert str(helper) in graph[module]
+    assert all(enerator.sitemap.SITEMAP.name in inputs for inputs in graph.values())
+    package = f"{module.split('.')[0]}/__init__.py"
+    assert all(package in inputs for inputs in graph.values())
+    mtimes = [path.stat().st_mtime_ns for path in paths]
+    data.write_text("second")
+    paths = enerator.generate.generate_site(out)
+    assert paths[0].read_text() == "<p>second</p>"
+    assert [path.stat().st_mtime_ns for path in paths[1:]] == mtimes[1:]
+    helper.write_text("def wrap(text):\n    return f'<div>{text}</div>'\n")
+    del sys.modules[helper.stem]  # noqa:WPS420
+    del sys.modules[module]  # noqa:WPS420
+    paths = enerator.generate.generate_site(out)
+    assert paths[0].read_text() == "<div>second</div>"
+    del sys.modules[helper.stem]  # noqa:WPS420
+
+
+def test_preview_watches_deps(make_pages: dict) -> None:
+    import enerator.preview  # noqa:WPS433
+
+    module, sitepath = next(iter(make_pages.items()))
+    name = module.replace(".", "_")
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(PAGE.format(name=name, sitepath=sitepath))
+    pathlib.Path(f"helper_{name}.py").write_text("def wrap(text):\n    return text\n")
+    data = pathlib.Path(f"data_{name}.txt")
+    data.write_text("text")
+    body, watchlist = enerator.preview.render_page(module)
+    del sys.modules[f"helper_{name}"]  # noqa:WPS420
+    assert body == "text"
+    assert str(data.resolve()) in watchlist
+    assert str(pathlib.Path(f"helper_{name}.py").resolve()) in watchlist
+
+
+def test_preview_reloads_helpers(make_pages: dict) -> None:
+    import enerator.preview  # noqa:WPS433
+
+    module, sitepath = next(iter(make_pages.items()))
+    name = module.replace(".", "_")
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(PAGE.format(name=name, sitepath=sitepath))
+    helper = pathlib.Path(f"helper_{name}.py")
+    helper.write_text("def wrap(text):\n    return f'<p>v1 {text}</p>'\n")
+    pathlib.Path(f"data_{name}.txt").write_text("x")
+    body, _ = enerator.preview.render_page(module, 1)
+    assert body == "<p>v1 x</p>"
+    helper.write_text("def wrap(text):\n    return f'<p>v2 {text}</p>'\n")
+    mtime = helper.stat().st_mtime_ns + 1_000_000_000
+    os.utime(helper, ns=(mtime, mtime))
+    same_generation, _ = enerator.preview.render_page(module, 1)
+    body, _ = enerator.preview.render_page(module, 2)
+    del sys.modules[helper.stem]  # noqa:WPS420
+    assert same_generation == "<p>v1 x</p>"
+    assert body == "<p>v2 x</p>"
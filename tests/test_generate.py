@@ -1,8 +1,15 @@
 """Tests for enerator."""
 
+import asyncio
+import pathlib
+import sys
+
+import pytest  # type:ignore
+
 import enerator.add
 import enerator.commands
 import enerator.generate
+from enerator.manifest import read_manifest
 
 
 def test_generate_page(make_pages: dict) -> None:
@@ -25,3 +32,101 @@ def test_generate_page_devmode(make_pages: dict) -> None:
 def test_routes(make_pages: dict) -> None:
     new_pages = {v: k for k, v in make_pages.items()}
     assert new_pages == enerator.generate.routes()
+
+
+def test_generate_site(make_pages: dict) -> None:
+    serial = enerator.generate.generate_site(pathlib.Path("serial"))
+    parallel = enerator.generate.generate_site(pathlib.Path("parallel"), jobs=2)
+    assert len(serial) == len(make_pages)
+    for serial_path, parallel_path in zip(serial, parallel):
+        assert serial_path.read_text() == parallel_path.read_text()
+
+
+def test_generate_site_incremental(make_pages: dict) -> None:
+    out = pathlib.Path("out")
+    first = enerator.generate.generate_site(out)
+    mtimes = [path.stat().st_mtime_ns for path in first]
+    module = next(iter(make_pages))
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(pyfile.read_text().replace("Hello", "Goodbye"))
+    for modname in make_pages:
+        del sys.modules[modname]  # noqa:WPS420
+    second = enerator.generate.generate_site(out)
+    assert first == second
+    assert "Goodbye" in second[0].read_text()
+    assert [path.stat().st_mtime_ns for path in second[1:]] == mtimes[1:]
+
+
+def test_generate_site_staged(make_pages: dict) -> None:
+    out = pathlib.Path("out")
+    first = enerator.generate.generate_site(out, staged=True)
+    second = enerator.generate.generate_site(out, jobs=2, force=True, staged=True)
+    assert first == second
+    assert all(path.exists() for path in second)
+    assert sorted(path.name for path in out.parent.iterdir() if "out" in path.name) == [
+        "out"
+    ]
+
+
+def test_generate_site_precompressed(make_pages: dict) -> None:
+    out = pathlib.Path("out")
+    enerator.generate.generate_site(out)
+    paths = enerator.generate.generate_site(out, encodings=("gzip",))
+    for path in paths:
+        assert path.with_name("index.html.gz").exists()
+
+
+def test_page_context_single_load(make_pages: dict, monkeypatch) -> None:
+    calls = []
+    load_module = enerator.generate.load_module
+
+    def counting_load(module: str, devmode: bool = False) -> tuple:
+        calls.append(module)
+        return load_module(module, devmode)
+
+    monkeypatch.setattr(enerator.generate, "load_module", counting_load)
+    enerator.generate.generate_site(pathlib.Path("out"))
+    assert sorted(calls) == sorted(make_pages)
+    module = next(iter(make_pages))
+    context = enerator.generate.page_context(module)
+    assert context.modpath == enerator.add.module_to_path(module)
+    assert context.urls is enerator.generate.all_urls()
+
+
+def test_shared_url_table(make_pages: dict) -> None:
+    module = next(iter(make_pages))
+    context = enerator.generate.page_context(module)
+    seen = []
+    context = context._replace(page=lambda rel: seen.append(rel) or "")
+    assert not "".join(enerator.generate.render_iter(context, {"title": "T"}))
+    rel = seen[0]
+    assert rel["title"] == "T"
+    assert rel["modpath"] == context.modpath
+    assert rel[enerator.generate.link_name(module)] == make_pages[module]
+    assert rel.maps[1] is enerator.generate.all_urls()
+    with pytest.raises(TypeError):
+        enerator.generate.all_urls()["url_new"] = "/new"  # type: ignore
+
+
+def test_generate_site_async(make_pages: dict) -> None:
+    serial = enerator.generate.generate_site(pathlib.Path("serial"))
+    piped = asyncio.run(
+        enerator.generate.generate_site_async(pathlib.Path("piped"), queue_size=1)
+    )
+    assert [path.relative_to(pathlib.Path("piped").resolve()) for path in piped] == [
+        path.relative_to(pathlib.Path("serial").resolve()) for path in serial
+    ]
+    for serial_path, piped_path in zip(serial, piped):
+        assert serial_path.read_text() == piped_path.read_text()
+    manifest = read_manifest(pathlib.Path("piped"))
+    assert sorted(manifest) == sorted(make_pages)
+    assert all(entry["deps"] for entry in manifest.values())
+
+
+def test_generate_site_async_incremental(make_pages: dict) -> None:
+    out = pathlib.Path("out")
+    first = asyncio.run(enerator.generate.generate_site_async(out))
+    mtimes = [path.stat().st_mtime_ns for path in first]
+    second = asyncio.run(enerator.generate.generate_site_async(out, staged=True))
+    assert first == second
+    assert [path.stat().st_mtime_ns for path in second] == mtimes
@@ -0,0 +1,62 @@
+"""The command line and package import stay light."""
+
+import platform
+import subprocess  # noqa:S404
+import sys
+import typing
+
+import pytest  # type:ignore
+
+HEAVY_MODULES = ("asyncio", "cmarkgfm", "pygments", "uvicorn")
+COMMANDS = (("--help",), ("add", "-s", "/", "pages.home"))
+
+pytestmark = pytest.mark.skipif(
+    platform.python_implementation() != "CPython",
+    reason="other interpreters may import these modules at startup",
+)
+
+
+def imported_after(code: str, cwd, args: typing.Sequence[str] = ()) -> typing.Set[str]:
+    """Run Python code in a fresh interpreter and list what it imported.
+
+    Args:
+        code: Python statements to run
+        cwd: working directory
+        args: command line arguments
+
+    Returns:
+        top-level names of the modules loaded by the end of the run
+    """
+    report = "import sys; sys.stderr.write(' '.join(sys.modules))"
+    script = f"try:\n    {code}\nfinally:\n    {report}"
+    proc = subprocess.run(  # noqa:S603
+        [sys.executable, "-c", script, *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return {name.split(".")[0] for name in proc.stderr.split()}
+
+
+def test_package_import(tmp_path) -> None:
+    modules = imported_after("import enerator", tmp_path)
+    assert "enerator" in modules
+    assert not modules.intersection(HEAVY_MODULES)
+
+
+@pytest.mark.parametrize("args", COMMANDS)
+def test_command_imports(args, tmp_path) -> None:
+    code = "import enerator.commands; enerator.commands.main()"
+    modules = imported_after(code, tmp_path, args)
+    assert not modules.intersection(HEAVY_MODULES)
+
+
+def test_lazy_package(tmp_path) -> None:
+    code = (
+        "import sys, enerator; assert 'enerator.markdown' not in sys.modules; "
+        "assert callable(enerator.md_parse); "
+        "assert 'enerator.markdown' in sys.modules; "
+        "assert 'md_parse' in dir(enerator)"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True)  # noqa:S603
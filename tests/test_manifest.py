@@ -0,0 +1,18 @@
+"""Tests for the incremental build manifest."""
+
+import pathlib
+
+import enerator.generate
+import enerator.manifest
+
+
+def test_manifest_is_current(make_pages: dict) -> None:
+    out = pathlib.Path("out")
+    module = next(iter(make_pages))
+    enerator.generate.generate(module, out)
+    entry = enerator.manifest.read_manifest(out)[module]
+    urls = enerator.generate.urls_digest()
+    assert enerator.manifest.is_current(entry, urls)
+    assert not enerator.manifest.is_current(entry, "other")
+    pathlib.Path(entry["path"]).write_text("tampered")
+    assert not enerator.manifest.is_current(entry, urls)
@@ -1,6 +1,8 @@
 """Tests for enerator's markdown parsing and code highlighting."""
 
 
+import os
+
 import enerator.markdown
 
 
@@ -42,3 +44,111 @@ def test_md_highlight_and_parse():
 def test_escape_braces():
     result = enerator.markdown.escape_braces("{variable}")
     assert result == "{{variable}}"
+
+
+def test_highlight_cache(set_path):
+    enerator.markdown.highlight.cache_clear()
+    code = "```python\nimport os\n```"
+    first = enerator.markdown.md_highlight(code)
+    assert enerator.markdown.md_highlight(code) == first
+    info = enerator.markdown.highlight_cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_highlight_store(set_path):
+    enerator.markdown.highlight.cache_clear()
+    enerator.markdown.set_highlight_store(set_path / "store")
+    try:
+        first = enerator.markdown.highlight("python", "import os\n")
+        enerator.markdown.highlight.cache_clear()
+        before = enerator.markdown.highlight_cache_info()
+        assert enerator.markdown.highlight("python", "import os\n") == first
+        after = enerator.markdown.highlight_cache_info()
+    finally:
+        enerator.markdown.set_highlight_store(None)
+    assert after.store_hits == before.store_hits + 1
+    assert list((set_path / "store").glob("*/*"))
+
+
+def test_prune_highlight_store(set_path):
+    store = set_path / "store"
+    enerator.markdown.highlight.cache_clear()
+    enerator.markdown.set_highlight_store(store)
+    try:
+        enerator.markdown.highlight("python", "import os\n")
+        enerator.markdown.highlight("python", "import sys\n")
+    finally:
+        enerator.markdown.set_highlight_store(None)
+    stale, fresh = sorted(store.glob("*/*"))
+    os.utime(stale, (0, 0))
+    assert enerator.markdown.prune_highlight_store(store) == 1
+    assert list(store.glob("*/*")) == [fresh]
+
+
+def test_get_lexer_unknown():
+    lexer = enerator.markdown.get_lexer("squirrels")
+    assert lexer is enerator.markdown.get_lexer("squirrels")
+
+
+def test_md_blocks():
+    md = (
+        "[a]: /link\n\n# Heading\n\n- item\n\n- item\n\n"
+        "```python\nx = 1\n\ny = 2\n```\n\nSee [a].\n"
+    )
+    blocks = list(enerator.markdown.md_blocks(md, 1))
+    assert len(blocks) == 4
+    assert all(block.startswith("[a]: /link\n") for block in blocks)
+    assert "```python\nx = 1\n\ny = 2\n```\n" in blocks[2]
+
+
+def test_md_highlight_and_parse_iter():
+    md = "# Heading\n\n```python\nimport sys\n\n\nsys.exit()\n```\n\nSome [text][t]\n\n"
+    md = md * 20 + "[t]: /text\n"
+    streamed = list(enerator.markdown.md_highlight_and_parse_iter(md, 100))
+    assert len(streamed) > 1
+    assert "".join(streamed) == enerator.markdown.md_highlight_and_parse(md)
+
+
+def test_md_segments():
+    md = (
+        "Intro\n"
+        "~~~~ c++ {.numbered}\nint x;\n```\n~~~\n~~~~~  \n"
+        "Middle\n"
+        "  ```\n    indented\n  plain\n  ```\n"
+        "``` not`a`fence\n"
+        "```OBJECTIVE-C\nunclosed\n"
+    )
+    segments = list(enerator.markdown.md_segments(md))
+    assert [segment.text for segment in segments] == [
+        "Intro\n",
+        "\nMiddle\n",
+        "\n``` not`a`fence\n",
+        "",
+    ]
+    blocks = [segment.block for segment in segments]
+    assert blocks[0] == ("c++", "int x;\n```\n~~~\n")
+    assert blocks[1] == (None, "  indented\nplain\n")
+    assert blocks[2] == ("OBJECTIVE-C", "unclosed\n")
+    assert blocks[3] is None
+
+
+def test_md_segments_many_fences():
+    md = "text\n\n```python\nx = 1\n```\n\n" * 5000
+    segments = list(enerator.markdown.md_segments(md))
+    assert len(segments) == 5001
+    assert all(segment.block == ("python", "x = 1\n") for segment in segments[:-1])
+    unclosed = "```\n" + "line\n" * 100000
+    (segment, last) = enerator.markdown.md_segments(unclosed)
+    assert segment.block.code == "line\n" * 100000
+    assert last == ("", None)
+
+
+def test_md_highlight_tilde_fence():
+    result = enerator.markdown.md_highlight("~~~python\nimport sys\n~~~\n\nSome text")
+    assert result.startswith('<div class="highlight">')
+    assert result.endswith("</pre></div>\n\n\nSome text")
+
+
+def test_md_blocks_long_fence():
+    md = "````\n```\n\nnot a split\n```\n````\n\nAfter\n"
+    assert len(list(enerator.markdown.md_blocks(md, 1))) == 2
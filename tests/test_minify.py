@@ -0,0 +1,79 @@
+"""Tests for HTML minification."""
+
+import pathlib
+
+import enerator.generate
+import enerator.manifest
+import enerator.markdown
+import enerator.minify
+
+CODE_MD = "# Heading\n\n```python\nimport sys\nx = 1\n```\n\nSome   text\n"
+
+
+def test_minify_whitespace_and_attributes():
+    html = "<div  class=\"a b\" id='c'>\n  <p>Some   text</p>\n</div>\n<br />"
+    result = enerator.minify.minify(html)
+    assert result == '<div class="a b" id=c><p>Some text</p></div><br/>'
+
+
+def test_minify_keeps_raw_elements():
+    html = (
+        "<p>a  b</p>\n<pre>  x\n\n  y</pre>\n"
+        "<!--  note  -->\n<textarea> t </textarea>"
+    )
+    result = enerator.minify.minify(html)
+    assert "<pre>  x\n\n  y</pre>" in result
+    assert "<!--  note  -->" in result
+    assert "<textarea> t </textarea>" in result
+    assert result.startswith("<p>a b</p>")
+
+
+def test_minify_code():
+    html = enerator.markdown.md_highlight_and_parse(CODE_MD)
+    result = enerator.minify.minify(html, shorten=False)
+    assert "<span></span>" not in result
+    assert 'class="w"' not in result
+    assert "<span class=kn>import</span> <span class=nn>sys</span>" in result
+    assert "<p>Some text</p>" in result
+    assert len(result) < len(html)
+
+
+def test_minify_short_classes():
+    html = enerator.markdown.md_highlight_and_parse(CODE_MD)
+    result = enerator.minify.minify(html, shorten=True)
+    css = enerator.minify.highlight_css()
+    classes = enerator.minify.class_map()
+    assert f"<span class={classes['kn']}>import</span>" in result
+    assert f".highlight .{classes['kn']} {{" in css
+    assert "x <span" in result
+    assert len(set(classes.values())) <= len(classes)
+
+
+def test_short_name():
+    names = [enerator.minify.short_name(index) for index in range(28)]
+    assert names[:3] == ["a", "b", "c"]
+    assert names[26:] == ["ba", "bb"]
+    assert len(set(names)) == len(names)
+
+
+def test_report():
+    report = enerator.minify.report([(100, 60), (100, 40)])
+    assert report == "Minified 2 pages: 200 -> 100 bytes (100 bytes, 50.0% saved)"
+    assert "0.0% saved" in enerator.minify.report([])
+
+
+def test_generate_site_minified(make_pages: dict) -> None:
+    out = pathlib.Path("out")
+    plain = enerator.generate.generate_site(out)
+    sizes = [path.stat().st_size for path in plain]
+    enerator.minify.configure(True, True)
+    try:
+        minified = enerator.generate.generate_site(out, jobs=2)
+    finally:
+        enerator.minify.configure(False)
+    assert [path.stat().st_size for path in minified] <= sizes
+    assert (out / enerator.minify.CSS_FILE).exists()
+    manifest = enerator.manifest.read_manifest(out)
+    for module in make_pages:
+        original, size = manifest[module]["minified"]
+        assert size <= original
@@ -0,0 +1,113 @@
+"""Tests for enerator."""
+
+import gzip
+import os
+import pathlib
+import pickle
+
+import pytest  # type:ignore
+
+import enerator.output
+
+
+def test_write_if_changed(set_path) -> None:
+    path = set_path / "index.html"
+    assert enerator.output.write_if_changed(path, b"content")
+    assert not enerator.output.write_if_changed(path, b"content")
+    assert enerator.output.write_if_changed(path, b"changed")
+    assert path.read_bytes() == b"changed"
+
+
+def test_write_chunks_if_changed(set_path) -> None:
+    path = set_path / "index.html"
+    written, first = enerator.output.write_chunks_if_changed(path, (b"a", b"b"))
+    assert written
+    mtime = path.stat().st_mtime_ns
+    written, second = enerator.output.write_chunks_if_changed(path, (b"ab",))
+    assert not written
+    assert first == second
+    assert path.stat().st_mtime_ns == mtime
+    assert list(set_path.iterdir()) == [path]
+
+
+def test_writer(set_path) -> None:
+    with enerator.output.OutputWriter(pathlib.Path("out")) as writer:
+        path, _ = writer.write("a/b/index.html", (b"page",))
+        writer.write("index.html", (b"home",))
+    assert path == set_path / "out" / "a" / "b" / "index.html"
+    assert path.read_bytes() == b"page"
+    assert (writer.written, writer.skipped) == (2, 0)
+    with enerator.output.OutputWriter(pathlib.Path("out")) as writer:
+        writer.write("a/b/index.html", (b"page",))
+    assert (writer.written, writer.skipped) == (0, 1)
+
+
+def test_writer_large(set_path, monkeypatch) -> None:
+    monkeypatch.setattr(enerator.output, "BUFFER_SIZE", 4)
+    with enerator.output.OutputWriter(pathlib.Path("out")) as writer:
+        path, _ = writer.write("index.html", iter((b"abc", b"def", b"ghi")))
+    assert path.read_bytes() == b"abcdefghi"
+
+
+def test_writer_staged(set_path) -> None:
+    out = pathlib.Path("out")
+    with enerator.output.OutputWriter(out) as writer:
+        writer.write("kept/index.html", (b"kept",))
+        writer.write("index.html", (b"old",))
+    kept = out / "kept" / "index.html"
+    inode = kept.stat().st_ino
+    with enerator.output.OutputWriter(out, staged=True) as writer:
+        writer.write("index.html", (b"new",))
+        assert (out / "index.html").read_bytes() == b"old"
+    assert (out / "index.html").read_bytes() == b"new"
+    assert kept.read_bytes() == b"kept"
+    assert kept.stat().st_ino == inode
+    assert sorted(os.listdir(set_path)) == ["out"]
+
+
+def test_writer_staged_error(set_path) -> None:
+    out = pathlib.Path("out")
+    with enerator.output.OutputWriter(out) as writer:
+        writer.write("index.html", (b"old",))
+    with pytest.raises(RuntimeError):
+        with enerator.output.OutputWriter(out, staged=True) as writer:
+            writer.write("index.html", (b"new",))
+            raise RuntimeError("build failed")
+    assert (out / "index.html").read_bytes() == b"old"
+    assert sorted(os.listdir(set_path)) == ["out"]
+
+
+def test_writer_pickle(set_path) -> None:
+    with enerator.output.OutputWriter(pathlib.Path("out")) as writer:
+        copy = pickle.loads(pickle.dumps(writer))
+        assert copy.executor is None
+        path, _ = copy.write("index.html", (b"page",))
+        assert path.read_bytes() == b"page"
+
+
+def test_writer_precompress(set_path) -> None:
+    out = pathlib.Path("out")
+    with enerator.output.OutputWriter(out, encodings=("gzip", "nope")) as writer:
+        path, _ = writer.write("index.html", (b"<p>page</p>" * 100,))
+    assert writer.encodings == ("gzip",)
+    gz_path = out / "index.html.gz"
+    assert gzip.decompress(gz_path.read_bytes()) == path.read_bytes()
+    mtime = gz_path.stat().st_mtime_ns
+    with enerator.output.OutputWriter(out, encodings=("gzip",)) as writer:
+        writer.write("index.html", (b"<p>page</p>" * 100,))
+    assert gz_path.stat().st_mtime_ns == mtime
+    with enerator.output.OutputWriter(out, encodings=("gzip",)) as writer:
+        writer.write("index.html", (b"changed",))
+    assert gzip.decompress(gz_path.read_bytes()) == b"changed"
+    with enerator.output.OutputWriter(out) as writer:
+        writer.write("index.html", (b"uncompressed",))
+    assert not gz_path.exists()
+
+
+def test_writer_keep(set_path) -> None:
+    out = pathlib.Path("out")
+    with enerator.output.OutputWriter(out) as writer:
+        path, _ = writer.write("index.html", (b"page",))
+    with enerator.output.OutputWriter(out, encodings=("gzip",)) as writer:
+        writer.keep(path)
+    assert gzip.decompress((out / "index.html.gz").read_bytes()) == b"page"
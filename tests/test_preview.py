@@ -1,15 +1,21 @@
 """Tests for enerator."""
 
+import asyncio
 import multiprocessing
 import pathlib
+import time
 
 from starlette.testclient import TestClient
 
+import enerator.add
 import enerator.commands
 import enerator.preview
 
 HTTP_OK = 200
 HTTP_NOT_FOUND = 404
+HTTP_NOT_MODIFIED = 304
+HTTP_PARTIAL = 206
+HTTP_RANGE_NOT_SATISFIABLE = 416
 
 
 def test_preview_app(make_pages: dict) -> None:
@@ -54,3 +60,202 @@ def test_preview_cmd(make_pages: dict, http) -> None:
             assert handle.getcode() == HTTP_OK
             assert handle.read()
     proc.terminate()
+
+
+def test_render_coalesced(make_pages: dict, monkeypatch) -> None:
+    calls = []
+
+    def slow_render(module, emit, generation=None):
+        calls.append(module)
+        emit("<p>first</p>")
+        time.sleep(0.05)
+        emit("<p>second</p>")
+        return []
+
+    async def collect(pending):
+        return b"".join([chunk async for chunk in pending.follow()])
+
+    async def render_twice(module):
+        first = enerator.preview.page_render(module, ())
+        second = enerator.preview.page_render(module, ())
+        assert first is second
+        return await asyncio.gather(collect(first), collect(second))
+
+    monkeypatch.setattr(enerator.preview, "stream_page", slow_render)
+    module = next(iter(make_pages))
+    body = b"<p>first</p><p>second</p>"
+    assert asyncio.run(render_twice(module)) == [body, body]
+    assert calls == [module]
+    assert not enerator.preview.rendering
+    assert enerator.preview.page_cache[module].body == body
+
+
+def test_render_process_pool(make_pages: dict) -> None:
+    enerator.preview.set_render_pool("process", 1)
+    try:
+        client = TestClient(enerator.preview.app)  # type:ignore
+        response = client.get(next(iter(make_pages.values())))
+    finally:
+        enerator.preview.set_render_pool()
+    assert response.status_code == HTTP_OK
+    assert "Hello" in response.text
+    assert response.headers["etag"] == enerator.preview.page_etag(response.content)
+
+
+def test_preview_page_cache(make_pages: dict, monkeypatch) -> None:
+    calls = []
+    stream_page = enerator.preview.stream_page
+
+    def counting_render(module, emit, generation=None):
+        calls.append(module)
+        return stream_page(module, emit, generation)
+
+    monkeypatch.setattr(enerator.preview, "stream_page", counting_render)
+    client = TestClient(enerator.preview.app)  # type:ignore
+    module, urlpath = next(iter(make_pages.items()))
+    first = client.get(urlpath)
+    second = client.get(urlpath)
+    assert second.text == first.text
+    etag = second.headers["etag"]
+    cached = client.get(urlpath, headers={"if-none-match": etag})
+    assert cached.status_code == HTTP_NOT_MODIFIED
+    assert not cached.content
+    assert len(calls) == 1
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(pyfile.read_text().replace("Hello", "Goodbye"))
+    changed = client.get(urlpath, headers={"if-none-match": etag})
+    assert changed.status_code == HTTP_OK
+    assert "Goodbye" in changed.text
+    assert len(calls) == 2
+
+
+def test_preview_app_asset_headers(set_path) -> None:
+    asset = pathlib.Path("assets/image.bin")
+    asset.parent.mkdir()
+    asset.write_bytes(bytes(range(256)) * 4)
+    client = TestClient(enerator.preview.app)  # type:ignore
+    response = client.get("/assets/image.bin")
+    assert response.content == asset.read_bytes()
+    assert response.headers["content-length"] == "1024"
+    etag = response.headers["etag"]
+    cached = client.get("/assets/image.bin", headers={"if-none-match": etag})
+    assert cached.status_code == HTTP_NOT_MODIFIED
+    since = response.headers["last-modified"]
+    cached = client.get("/assets/image.bin", headers={"if-modified-since": since})
+    assert cached.status_code == HTTP_NOT_MODIFIED
+    partial = client.get("/assets/image.bin", headers={"range": "bytes=10-19"})
+    assert partial.status_code == HTTP_PARTIAL
+    assert partial.content == bytes(range(10, 20))
+    assert partial.headers["content-range"] == "bytes 10-19/1024"
+    suffix = client.get("/assets/image.bin", headers={"range": "bytes=-4"})
+    assert suffix.content == bytes(range(252, 256))
+    unsatisfiable = client.get("/assets/image.bin", headers={"range": "bytes=2000-"})
+    assert unsatisfiable.status_code == HTTP_RANGE_NOT_SATISFIABLE
+
+
+def test_preview_app_asset_outside(set_path) -> None:
+    pathlib.Path("assets").mkdir()
+    pathlib.Path("secret.txt").write_text("secret")
+    client = TestClient(enerator.preview.app)  # type:ignore
+    response = client.get("/assets/%2E%2E/secret.txt")
+    assert response.status_code == HTTP_NOT_FOUND
+
+
+def test_preview_app_pathsend(set_path) -> None:
+    asset = pathlib.Path("assets/style.css")
+    asset.parent.mkdir()
+    asset.write_text("body {color: black;}")
+    scope = {
+        "type": "http",
+        "path": "/assets/style.css",
+        "headers": [],
+        "extensions": {"http.response.pathsend": {}},
+    }
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(enerator.preview.app(scope, None, send))  # type:ignore
+    assert sent[0]["status"] == HTTP_OK
+    assert sent[1] == {"type": "http.response.pathsend", "path": str(asset.resolve())}
+
+
+def test_preview_app_streamed(make_pages: dict) -> None:
+    module, urlpath = next(iter(make_pages.items()))
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(
+        pyfile.read_text().replace(
+            "enerator.md_highlight_and_parse(md)",
+            'enerator.md_highlight_and_parse_iter((md + "\\n\\n") * 3, 1)',
+        )
+    )
+    client = TestClient(enerator.preview.app)  # type:ignore
+    response = client.get(urlpath)
+    assert response.text.count("<p><em>Hello</em>") == 3
+
+
+def test_sse_multiplexed(make_pages: dict) -> None:
+    modules = list(make_pages)
+    changed_module = modules[1]
+    source = enerator.add.module_to_path(changed_module) / "__init__.py"
+
+    async def first_events() -> list:
+        stream = enerator.preview.sse_body_gen(modules)
+        events = [await stream.__anext__()]
+        source.write_text(source.read_text())
+        events.append(await asyncio.wait_for(stream.__anext__(), 5))
+        await stream.aclose()
+        return events
+
+    prelude, event = asyncio.run(first_events())
+    assert len(prelude) < enerator.preview.SSE_PADDING * 2
+    assert b"retry:" in prelude
+    assert event == f"data: {changed_module}\n\n".encode()
+
+
+def test_sse_heartbeat(make_pages: dict, monkeypatch) -> None:
+    monkeypatch.setattr(enerator.preview, "HEARTBEAT_INTERVAL", 0.01)
+
+    async def heartbeat() -> bytes:
+        stream = enerator.preview.sse_body_gen(list(make_pages)[:1])
+        await stream.__anext__()
+        beat = await stream.__anext__()
+        await stream.aclose()
+        return beat
+
+    assert asyncio.run(heartbeat()) == b":\n\n"
+
+
+def test_sse_watches_new_deps(make_pages: dict) -> None:
+    module = next(iter(make_pages))
+    helper = pathlib.Path("helper.txt").resolve()
+    helper.write_text("first")
+
+    async def change_after_render() -> bytes:
+        stream = enerator.preview.sse_body_gen([module])
+        await stream.__anext__()
+        page = enerator.preview.CachedPage((), (str(helper),), b"", '""')
+        enerator.preview.store_page(module, page)
+        await asyncio.sleep(0.05)
+        helper.write_text("second")
+        event = await asyncio.wait_for(stream.__anext__(), 5)
+        await stream.aclose()
+        return event
+
+    try:
+        assert asyncio.run(change_after_render()) == f"data: {module}\n\n".encode()
+    finally:
+        enerator.preview.page_cache.pop(module, None)
+    assert not enerator.preview.streams
+
+
+def test_preview_reload_worker(make_pages: dict) -> None:
+    client = TestClient(enerator.preview.app)  # type:ignore
+    worker = client.get("/reload.js")
+    assert worker.status_code == HTTP_OK
+    assert "EventSource" in worker.text
+    assert client.get("/sse").status_code == HTTP_NOT_FOUND
+    page = enerator.preview.with_reload_script("<html></html>", "pages.home")
+    assert "SharedWorker('/reload.js')" in page
+    assert 'const module = "pages.home";' in page
@@ -1,6 +1,11 @@
 """Tests sitemap functions."""
 
 import contextlib
+import multiprocessing
+import os
+import time
+
+import pytest  # type:ignore
 
 import enerator.sitemap
 
@@ -36,3 +41,67 @@ def test_sitemap_add_new_file(set_path):
     enerator.sitemap.sitemap_read.cache_clear()
     result = enerator.sitemap.sitemap_read()
     assert module in result
+
+
+def test_sitemap_read_dedup(set_path):
+    (set_path / enerator.sitemap.SITEMAP).write_text("b\n\na\n# comment\nb\n")
+    assert enerator.sitemap.sitemap_read() == ["b", "a"]
+    assert enerator.sitemap.sitemap_contains("a")
+    assert not enerator.sitemap.sitemap_contains("comment")
+
+
+def test_sitemap_read_external_edit(set_path):
+    sitemap = set_path / enerator.sitemap.SITEMAP
+    sitemap.write_text("first")
+    assert enerator.sitemap.sitemap_read() == ["first"]
+    sitemap.write_text("first\nsecond")
+    assert enerator.sitemap.sitemap_read() == ["first", "second"]
+
+
+def test_sitemap_add_many(set_path):
+    enerator.sitemap.sitemap_add_many(["pages.b", "pages.a"])
+    assert enerator.sitemap.sitemap_add_many(["pages.c", "pages.a"]) == ["pages.c"]
+    enerator.sitemap.sitemap_add("pages.aa")
+    enerator.sitemap.sitemap_add("pages.a")
+    expected = ["pages.a", "pages.aa", "pages.b", "pages.c"]
+    assert enerator.sitemap.sitemap_read() == expected
+    assert (set_path / enerator.sitemap.SITEMAP).read_text() == "\n".join(expected)
+
+
+def test_sitemap_remove_many(set_path):
+    enerator.sitemap.sitemap_write(["pages.a", "pages.b", "pages.c"])
+    removed = enerator.sitemap.sitemap_remove_many(["pages.c", "pages.x"])
+    assert removed == ["pages.c"]
+    enerator.sitemap.sitemap_remove("pages.a")
+    assert enerator.sitemap.sitemap_read() == ["pages.b"]
+
+
+def test_sitemap_concurrent_add(set_path):
+    modules = [f"pages.page{number:02}" for number in range(20)]
+    with multiprocessing.Pool(4) as pool:
+        pool.map(enerator.sitemap.sitemap_add, modules)
+    assert enerator.sitemap.sitemap_read() == modules
+    assert not list(set_path.glob("*.lock"))
+
+
+def test_sitemap_lock_left_over(set_path):
+    lock_path = set_path / f"{enerator.sitemap.SITEMAP.name}.lock"
+    lock_path.touch()
+    with enerator.sitemap.sitemap_lock():
+        assert lock_path.exists()
+    assert not lock_path.exists()
+
+
+def test_sitemap_lock_file_stale(set_path, monkeypatch):
+    monkeypatch.setattr(enerator.sitemap, "fcntl", None)
+    monkeypatch.setattr(enerator.sitemap, "LOCK_TIMEOUT", 0.05)
+    lock_path = set_path / f"{enerator.sitemap.SITEMAP.name}.lock"
+    lock_path.touch()
+    with pytest.raises(TimeoutError):
+        with enerator.sitemap.sitemap_lock():
+            pass  # noqa:WPS420
+    stale = time.time() - enerator.sitemap.LOCK_STALE - 1
+    os.utime(lock_path, (stale, stale))
+    with enerator.sitemap.sitemap_lock():
+        assert lock_path.exists()
+    assert not lock_path.exists()
@@ -0,0 +1,53 @@
+"""Tests for build timing."""
+
+import enerator.timing
+
+
+def test_timed_disabled():
+    enerator.timing.enable(False)
+    enerator.timing.set_page("page")
+
+    @enerator.timing.timed("load_module")
+    def func(arg):
+        return arg
+
+    assert func(1) == 1
+    assert not enerator.timing.page_times
+
+
+def test_timed_report():
+    enerator.timing.enable()
+    try:
+        enerator.timing.set_page("page")
+
+        @enerator.timing.timed("md_parse")
+        def func(arg):
+            return arg
+
+        assert func(1) == 1
+        assert list(enerator.timing.timed_iter("generate_page", "ab")) == ["a", "b"]
+        enerator.timing.record("total", 1)
+        stages = enerator.timing.page_times["page"]
+        assert set(stages) == {"md_parse", "generate_page", "total"}
+        report = enerator.timing.report(5)
+    finally:
+        enerator.timing.enable(False)
+    assert "Slowest 1 pages" in report
+    assert "page" in report
+
+
+def test_counters_report():
+    enerator.timing.enable()
+    try:
+        enerator.timing.set_page("page")
+        enerator.timing.count("highlight_blocks", 3)
+        enerator.timing.count("highlight_store_hits")
+        enerator.timing.count("highlight_rendered")
+        enerator.timing.set_page("other")
+        enerator.timing.count("highlight_blocks")
+        report = enerator.timing.report()
+    finally:
+        enerator.timing.enable(False)
+    enerator.timing.count("highlight_blocks")
+    assert not enerator.timing.page_times
+    assert "4 blocks, 2 from memory, 1 from disk, 1 highlighted" in report
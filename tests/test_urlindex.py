@@ -0,0 +1,28 @@
+"""Tests for the static URL index."""
+
+import sys
+
+import enerator.add
+import enerator.urlindex
+
+
+def test_url_index_no_import(make_pages: dict) -> None:
+    index = enerator.urlindex.url_index()
+    assert index == make_pages
+    assert not set(make_pages) & set(sys.modules)
+
+
+def test_url_index_mtime(make_pages: dict) -> None:
+    enerator.urlindex.url_index()
+    module = next(iter(make_pages))
+    pyfile = enerator.add.module_to_path(module) / "__init__.py"
+    pyfile.write_text(pyfile.read_text().replace(make_pages[module], "/moved"))
+    assert enerator.urlindex.url_index()[module] == "/moved"
+
+
+def test_static_path_dynamic(set_path) -> None:
+    source = set_path / "page.py"
+    source.write_text('import os\nCONFIG = {"path": os.sep}\n')
+    assert enerator.urlindex.static_path(source) is None
+    source.write_text('CONFIG: dict = {"title": str(1), "path": "/here"}\n')
+    assert enerator.urlindex.static_path(source) == "/here"
@@ -0,0 +1,61 @@
+"""Tests for the shared file watcher."""
+
+import asyncio
+
+import pytest  # type:ignore
+
+import enerator.watch
+
+TIMEOUT = 5
+
+
+async def change_and_wait(watcher, path):
+    queue = watcher.subscribe([path])
+    other = watcher.subscribe([path.with_name("other.txt")])
+    await asyncio.sleep(0.05)
+    path.write_text("changed")
+    try:
+        changed = await asyncio.wait_for(queue.get(), TIMEOUT)
+    finally:
+        watcher.unsubscribe(queue)
+    assert other.empty()
+    watcher.unsubscribe(other)
+    return changed
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watcher(set_path, use_inotify):
+    path = set_path / "watched.txt"
+    path.write_text("original")
+    watcher = enerator.watch.Watcher(interval=0.01, use_inotify=use_inotify)
+    changed = asyncio.run(change_and_wait(watcher, path))
+    assert path.resolve() in changed
+    assert watcher.fd is None
+    assert watcher.poller is None
+
+
+def test_shared_watcher():
+    async def get_twice():
+        return enerator.watch.shared_watcher(), enerator.watch.shared_watcher()
+
+    first, second = asyncio.run(get_twice())
+    assert first is second
+
+
+def test_last_modified_missing(set_path):
+    assert enerator.watch.last_modified(set_path / "missing") is None
+
+
+def test_publish_merges_pending(set_path):
+    async def publish_twice():
+        watcher = enerator.watch.Watcher(use_inotify=False)
+        first, second = set_path / "a.txt", set_path / "b.txt"
+        queue = watcher.subscribe([first, second])
+        watcher.publish({first.resolve()})
+        watcher.publish({second.resolve()})
+        changed = queue.get_nowait()
+        watcher.unsubscribe(queue)
+        return changed
+
+    changed = asyncio.run(publish_twice())
+    assert changed == {(set_path / "a.txt").resolve(), (set_path / "b.txt").resolve()}